@@ -0,0 +1,189 @@
+"""Local stand-in for the Auth0 endpoints the API talks to.
+
+Serves the JWKS, the client-credentials token endpoint and the parts of the
+Management API used by the user endpoints, over HTTPS with a self-signed
+certificate. The API is pointed at it with ``AUTH0_DOMAIN=127.0.0.1:<port>``
+and ``SSL_CERT_FILE=<material>/cert.pem``, so it runs unmodified.
+
+    python -m bench.auth0_mock --material /tmp/auth0 --port 8443
+"""
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import json
+import os
+import ssl
+import time
+
+import jwt
+from aiohttp import web
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+KID = "bench-key"
+AUDIENCE = "https://abot-dashboard-api/"
+TEAMS = ["social_care", "eip", "cafd", "not_enough_information"]
+ROLES = ["super_admin", "cafd_admin", "social_care_admin", "eip_admin", "staff"]
+
+
+def generate_material(directory: str):
+    """Writes a signing key, its JWKS and a TLS certificate for 127.0.0.1."""
+    os.makedirs(directory, exist_ok=True)
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    with open(os.path.join(directory, "key.pem"), "wb") as f:
+        f.write(key_pem)
+
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(key.public_key()))
+    jwk.update({"kid": KID, "use": "sig", "alg": "RS256"})
+    with open(os.path.join(directory, "jwks.json"), "w") as f:
+        json.dump({"keys": [jwk]}, f)
+
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=30))
+        .add_extension(
+            x509.SubjectAlternativeName(
+                [x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]
+            ),
+            critical=False,
+        )
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    with open(os.path.join(directory, "cert.pem"), "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+
+
+def sign_token(directory: str, domain: str, sub: str, ttl: int = 3600) -> str:
+    """Signs an access token the API will accept for the mock tenant."""
+    with open(os.path.join(directory, "key.pem"), "rb") as f:
+        key = f.read()
+    now = int(time.time())
+    payload = {
+        "sub": sub,
+        "aud": AUDIENCE,
+        "iss": f"https://{domain}/",
+        "iat": now,
+        "exp": now + ttl,
+    }
+    return jwt.encode(payload, key, algorithm="RS256", headers={"kid": KID})
+
+
+def build_app(material: str, users: int = 200, latency_ms: float = 0.0) -> web.Application:
+    with open(os.path.join(material, "jwks.json")) as f:
+        jwks = json.load(f)
+    roles = [{"id": f"rol_{name}", "name": name} for name in ROLES]
+    directory = {
+        f"auth0|bench-{i}": {
+            "user_id": f"auth0|bench-{i}",
+            "name": f"Bench User {i}",
+            "email": f"bench{i}@example.com",
+            "created_at": f"2024-01-{(i % 28) + 1:02d}T00:00:00.000Z",
+            "user_metadata": {"team": TEAMS[i % len(TEAMS)]},
+        }
+        for i in range(users)
+    }
+
+    @web.middleware
+    async def simulated_latency(request, handler):
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        return await handler(request)
+
+    async def get_jwks(request):
+        return web.json_response(jwks)
+
+    async def post_token(request):
+        return web.json_response(
+            {"access_token": "bench-management-token", "expires_in": 86400, "token_type": "Bearer"}
+        )
+
+    async def get_roles(request):
+        return web.json_response(roles)
+
+    async def get_user_roles(request):
+        # Every bench user is an admin so the admin endpoints are exercised
+        return web.json_response(roles[:1])
+
+    async def post_user_roles(request):
+        return web.Response(status=204)
+
+    async def search_users(request):
+        query = request.query.get("q", "")
+        term = query.split("*")[1].lower() if query.count("*") >= 2 else ""
+        matches = [u for u in directory.values() if term in u["name"].lower() or term in u["email"]]
+        page = int(request.query.get("page", 0))
+        per_page = int(request.query.get("per_page", 10))
+        start = page * per_page
+        return web.json_response(
+            {"users": matches[start:start + per_page], "start": start, "limit": per_page, "total": len(matches)}
+        )
+
+    async def get_user(request):
+        user = directory.get(request.match_info["user_id"])
+        if user is None:
+            return web.json_response({"statusCode": 404, "message": "The user does not exist."}, status=404)
+        return web.json_response(user)
+
+    async def create_user(request):
+        body = await request.json()
+        user_id = f"auth0|bench-{len(directory)}"
+        directory[user_id] = {"user_id": user_id, **body}
+        return web.json_response(directory[user_id], status=201)
+
+    async def delete_user(request):
+        if directory.pop(request.match_info["user_id"], None) is None:
+            return web.Response(status=404)
+        return web.Response(status=204)
+
+    app = web.Application(middlewares=[simulated_latency])
+    app.router.add_get("/.well-known/jwks.json", get_jwks)
+    app.router.add_post("/oauth/token", post_token)
+    app.router.add_get("/api/v2/roles", get_roles)
+    app.router.add_get("/api/v2/users", search_users)
+    app.router.add_post("/api/v2/users", create_user)
+    app.router.add_get("/api/v2/users/{user_id}/roles", get_user_roles)
+    app.router.add_post("/api/v2/users/{user_id}/roles", post_user_roles)
+    app.router.add_get("/api/v2/users/{user_id}", get_user)
+    app.router.add_delete("/api/v2/users/{user_id}", delete_user)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--material", required=True, help="directory holding key.pem, jwks.json and cert.pem")
+    parser.add_argument("--port", type=int, default=8443)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every response")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.material, "cert.pem")):
+        generate_material(args.material)
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(os.path.join(args.material, "cert.pem"), os.path.join(args.material, "key.pem"))
+    web.run_app(
+        build_app(args.material, args.users, args.latency_ms),
+        host="127.0.0.1",
+        port=args.port,
+        ssl_context=context,
+        print=None,
+    )
+
+
+if __name__ == "__main__":
+    main()
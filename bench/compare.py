@@ -0,0 +1,60 @@
+"""Compares two benchmark reports endpoint by endpoint.
+
+    python -m bench.compare baseline.json candidate.json --threshold 10
+
+Exits non-zero when any endpoint's p95 regressed by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms", "throughput_rps"]
+
+
+def change(before, after):
+    if not before or after is None:
+        return None
+    return round((after - before) / before * 100, 1)
+
+
+def compare(baseline: dict, candidate: dict) -> dict:
+    names = sorted(set(baseline["endpoints"]) | set(candidate["endpoints"]))
+    report = {}
+    for name in names:
+        old = baseline["endpoints"].get(name, {})
+        new = candidate["endpoints"].get(name, {})
+        report[name] = {
+            metric: {"before": old.get(metric), "after": new.get(metric),
+                     "change_pct": change(old.get(metric), new.get(metric))}
+            for metric in METRICS
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed p95 regression in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    report = compare(baseline, candidate)
+    regressions = [
+        name for name, metrics in report.items()
+        if (metrics["p95_ms"]["change_pct"] or 0) > args.threshold
+    ]
+    print(json.dumps({
+        "baseline": baseline["meta"].get("commit"),
+        "candidate": candidate["meta"].get("commit"),
+        "endpoints": report,
+        "regressions": regressions,
+    }, indent=2))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Benchmark harness: seeds a local Postgres, starts the Auth0 stand-in and the
+API, drives a workload mix at a fixed concurrency and writes per-endpoint
+latency percentiles and throughput as JSON.
+
+    docker compose -f bench/docker-compose.yml up -d
+    python -m bench.run --mix default --concurrency 32 --duration 30 --out bench.json
+    python -m bench.compare baseline.json bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import aiohttp
+
+from bench import auth0_mock, seed
+from bench.workloads import GENERATORS, Context, parse_mix
+
+ROOT = seed.ROOT
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, int(round(pct / 100 * len(values))) - 1))
+    return values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 2),
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "mean_ms": round(sum(values) / len(values), 3) if values else None,
+        "max_ms": values[-1] if values else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def wait_for(url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url, ssl=False) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+def start_app(args, env):
+    if args.server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind",
+                   f"127.0.0.1:{args.app_port}", "main:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port",
+                   str(args.app_port), "--workers", str(args.workers), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=ROOT, env=env)
+
+
+async def drive(args, ctx, tokens):
+    """Runs ``concurrency`` closed-loop clients; only samples after warm-up are kept."""
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    latencies, errors, statuses = defaultdict(list), defaultdict(int), defaultdict(lambda: defaultdict(int))
+    base = f"http://127.0.0.1:{args.app_port}"
+    start = time.monotonic()
+    measure_from = start + args.warmup
+    deadline = measure_from + args.duration
+
+    async def client(index, session):
+        rng = random.Random(args.seed * 1000 + index)
+        headers = {"Authorization": f"Bearer {tokens[index % len(tokens)]}"}
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            endpoint, method, path, params, body = GENERATORS[rng.choices(names, weights)[0]](rng, ctx)
+            began = time.perf_counter()
+            try:
+                async with session.request(method, base + path, params=params, json=body,
+                                           headers=headers) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError:
+                status = 0
+            elapsed_ms = round((time.perf_counter() - began) * 1000, 3)
+            if now < measure_from:
+                continue
+            latencies[endpoint].append(elapsed_ms)
+            statuses[endpoint][str(status)] += 1
+            if status == 0 or status >= 500:
+                errors[endpoint] += 1
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(client(i, session) for i in range(args.concurrency)))
+    elapsed = args.duration
+
+    endpoints = {
+        name: {**summarize(values, errors[name], elapsed), "status_codes": dict(statuses[name])}
+        for name, values in sorted(latencies.items())
+    }
+    everything = [value for values in latencies.values() for value in values]
+    return endpoints, summarize(everything, sum(errors.values()), elapsed)
+
+
+async def _main(args):
+    material = tempfile.mkdtemp(prefix="abot-bench-")
+    auth0_mock.generate_material(material)
+    domain = f"127.0.0.1:{args.auth0_port}"
+
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "bench.auth0_mock", "--material", material, "--port", str(args.auth0_port),
+         "--latency-ms", str(args.auth0_latency_ms)],
+        cwd=ROOT,
+    )
+    app = None
+    try:
+        conn = await seed.connect(args)
+        try:
+            dataset = None
+            if not args.no_seed:
+                await seed.apply_schema(conn)
+                dataset = await seed.seed(conn, args.chat, args.manual, args.comments, args.assigned,
+                                          args.days, args.seed)
+            chat_ids = [r["sessionid"] for r in await conn.fetch(
+                "SELECT sessionid FROM chatrecords ORDER BY sessionid LIMIT $1", args.sample_ids)]
+            manual_ids = [r["sessionid"] for r in await conn.fetch(
+                "SELECT sessionid FROM manualrecords ORDER BY sessionid LIMIT $1", args.sample_ids)]
+        finally:
+            await conn.close()
+
+        env = {
+            **os.environ,
+            "AUTH0_DOMAIN": domain,
+            "AUTH0_API_AUDIENCE": auth0_mock.AUDIENCE,
+            "AUTH0_ISSUER": f"https://{domain}/",
+            "AUTH0_ALGORITHMS": "RS256",
+            "AUTH0_CLIENT_ID": "bench-client",
+            "AUTH0_CLIENT_SECRET": "bench-secret",
+            "SSL_CERT_FILE": os.path.join(material, "cert.pem"),
+            "PGHOST": args.pg_host,
+            "PGPORT": str(args.pg_port),
+            "PGUSER": args.pg_user,
+            "PGPASSWORD": args.pg_password,
+            "PGDATABASE": args.pg_database,
+        }
+        if args.replica_host:
+            env["PG_REPLICA_HOST"] = args.replica_host
+            env["PG_REPLICA_PORT"] = str(args.replica_port)
+        await wait_for(f"https://{domain}/.well-known/jwks.json")
+        app = start_app(args, env)
+        await wait_for(f"http://127.0.0.1:{args.app_port}/ready")
+
+        tokens = [auth0_mock.sign_token(material, domain, f"auth0|bench-{i}") for i in range(args.users)]
+        ctx = Context(chat_ids, manual_ids, admin_sid="auth0|bench-0")
+        endpoints, total = await drive(args, ctx, tokens)
+    finally:
+        for process in (app, mock):
+            if process is not None:
+                process.terminate()
+                process.wait()
+        shutil.rmtree(material, ignore_errors=True)
+
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "mix": parse_mix(args.mix),
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "server": args.server,
+            "workers": args.workers,
+            "auth0_latency_ms": args.auth0_latency_ms,
+            "replica": f"{args.replica_host}:{args.replica_port}" if args.replica_host else None,
+            "dataset": dataset,
+            "seed": args.seed,
+        },
+        "endpoints": endpoints,
+        "total": total,
+    }
+    output = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", default="default", help="named mix or weights such as list=60,detail=40")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds discarded before measuring")
+    parser.add_argument("--users", type=int, default=20, help="distinct JWT subjects used by the clients")
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--app-port", type=int, default=8000)
+    parser.add_argument("--auth0-port", type=int, default=8443)
+    parser.add_argument("--auth0-latency-ms", type=float, default=0.0)
+    parser.add_argument("--no-seed", action="store_true", help="reuse the data already in the database")
+    parser.add_argument("--sample-ids", type=int, default=5000, help="session ids drawn for detail/triage")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--replica-host", help="route the API's reads to this replica")
+    parser.add_argument("--replica-port", type=int, default=5433)
+    seed.add_pg_arguments(parser)
+    seed.add_seed_arguments(parser)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
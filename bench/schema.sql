@@ -0,0 +1,64 @@
+-- Baseline schema used by the benchmark harness. It mirrors the columns the
+-- API reads and writes; migrations/ is applied on top of it with tools.migrate.
+
+DROP TABLE IF EXISTS comments, assignee, chatrecords, manualrecords, audit_events, schema_migrations CASCADE;
+
+CREATE TABLE chatrecords (
+    sessionid               uuid PRIMARY KEY,
+    name                    text,
+    emailorphonenumber      text,
+    phonenumber             text,
+    datetimeofchat          timestamptz NOT NULL,
+    chatduration            integer,
+    chattranscript          text,
+    chatsummary             text,
+    category                text,
+    severity                text,
+    socialcareeligibility   text,
+    suggestedcourseofaction text,
+    nextsteps               text,
+    contactrequest          text,
+    status                  text,
+    rating                  text,
+    feedback                text,
+    action_taken_notes      text,
+    mark_as_complete        boolean NOT NULL DEFAULT false,
+    triaging_confirmed      boolean NOT NULL DEFAULT false,
+    flag                    text NOT NULL DEFAULT 'chat'
+);
+
+CREATE TABLE manualrecords (
+    sessionid             uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+    name                  text,
+    emailorphonenumber    text,
+    phonenumber           text,
+    datetime              timestamptz NOT NULL,
+    severity              text,
+    category              text,
+    request_details       text,
+    socialcareeligibility text,
+    action_taken_notes    text,
+    mark_as_complete      boolean NOT NULL DEFAULT false,
+    triaging_confirmed    boolean NOT NULL DEFAULT false,
+    flag                  text NOT NULL DEFAULT 'manual'
+);
+
+CREATE TABLE comments (
+    comment_id       serial PRIMARY KEY,
+    sessionid_chat   uuid REFERENCES chatrecords (sessionid),
+    sessionid_manual uuid REFERENCES manualrecords (sessionid),
+    comment          text,
+    email            text
+);
+
+CREATE INDEX comments_sessionid_chat_idx ON comments (sessionid_chat);
+CREATE INDEX comments_sessionid_manual_idx ON comments (sessionid_manual);
+
+CREATE TABLE assignee (
+    id               serial PRIMARY KEY,
+    sessionid_chat   uuid UNIQUE REFERENCES chatrecords (sessionid),
+    sessionid_manual uuid UNIQUE REFERENCES manualrecords (sessionid),
+    name             text,
+    email            text,
+    status           text
+);
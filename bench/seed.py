@@ -0,0 +1,143 @@
+"""Creates the schema and seeds deterministic chat/manual records, comments
+and assignees for the benchmark harness.
+
+    python -m bench.seed --chat 20000 --manual 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import asyncpg
+
+from tools import partitions
+from tools.migrate import migrate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEAMS = ["social_care", "eip", "cafd", "not_enough_information"]
+SEVERITIES = ["low", "medium", "high", "critical"]
+STATUSES = ["open", "in_progress", "waiting", "closed"]
+FIRST_NAMES = ["Amira", "Ben", "Chloe", "Dev", "Ellis", "Farah", "George", "Hana", "Isaac", "Jade"]
+LAST_NAMES = ["Ahmed", "Brown", "Clarke", "Davies", "Evans", "Khan", "Patel", "Smith", "Taylor", "Wilson"]
+
+
+async def connect(args) -> asyncpg.Connection:
+    return await asyncpg.connect(
+        user=args.pg_user, password=args.pg_password, database=args.pg_database, host=args.pg_host,
+        port=args.pg_port, server_settings={"timezone": "UTC"},
+    )
+
+
+async def apply_schema(conn: asyncpg.Connection):
+    with open(os.path.join(ROOT, "bench", "schema.sql")) as f:
+        await conn.execute(f.read())
+    await migrate(conn)
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _person(rng: random.Random):
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    email = f"{name.replace(' ', '.').lower()}{rng.randint(1, 999)}@example.com"
+    phone = f"07{rng.randint(100000000, 999999999)}"
+    return name, email, phone
+
+
+async def seed(conn: asyncpg.Connection, chat: int, manual: int, comments: float = 1.5,
+               assigned: float = 0.6, days: int = 365, seed_value: int = 42):
+    """Inserts the records with COPY; the same arguments always yield the same data."""
+    rng = random.Random(seed_value)
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    transcript = "User: I need some help with my situation.\nBot: Tell me more.\n" * 20
+
+    chat_rows = []
+    for _ in range(chat):
+        name, email, phone = _person(rng)
+        chat_rows.append((
+            _uuid(rng), name, email, phone, now - timedelta(seconds=rng.randint(0, days * 86400)),
+            rng.randint(60, 1800), transcript, "Summary of the conversation.", rng.choice(TEAMS),
+            rng.choice(SEVERITIES), rng.choice(["yes", "no", "unknown"]), "Call back", "Review",
+            rng.choice(["email", "phone"]), "new", str(rng.randint(1, 5)), "", None,
+            rng.random() < 0.7, rng.random() < 0.5, "chat",
+        ))
+    await conn.copy_records_to_table(
+        "chatrecords", records=chat_rows,
+        columns=["sessionid", "name", "emailorphonenumber", "phonenumber", "datetimeofchat", "chatduration",
+                 "chattranscript", "chatsummary", "category", "severity", "socialcareeligibility",
+                 "suggestedcourseofaction", "nextsteps", "contactrequest", "status", "rating", "feedback",
+                 "action_taken_notes", "mark_as_complete", "triaging_confirmed", "flag"],
+    )
+
+    manual_rows = []
+    for _ in range(manual):
+        name, email, phone = _person(rng)
+        manual_rows.append((
+            _uuid(rng), name, email, phone, now - timedelta(seconds=rng.randint(0, days * 86400)),
+            rng.choice(SEVERITIES), rng.choice(TEAMS), "Details of the request.", "unknown", None,
+            rng.random() < 0.7, rng.random() < 0.5, "manual",
+        ))
+    await conn.copy_records_to_table(
+        "manualrecords", records=manual_rows,
+        columns=["sessionid", "name", "emailorphonenumber", "phonenumber", "datetime", "severity", "category",
+                 "request_details", "socialcareeligibility", "action_taken_notes", "mark_as_complete",
+                 "triaging_confirmed", "flag"],
+    )
+
+    sessions = [(row[0], "chat") for row in chat_rows] + [(row[0], "manual") for row in manual_rows]
+    comment_rows, assignee_rows = [], []
+    for sessionid, flag in sessions:
+        chat_id, manual_id = (sessionid, None) if flag == "chat" else (None, sessionid)
+        for _ in range(int(rng.expovariate(1 / comments)) if comments else 0):
+            _, email, _ = _person(rng)
+            comment_rows.append((chat_id, manual_id, "Followed up with the caller.", email))
+        if rng.random() < assigned:
+            name, email, _ = _person(rng)
+            assignee_rows.append((chat_id, manual_id, name, email, rng.choice(STATUSES)))
+    await conn.copy_records_to_table(
+        "comments", records=comment_rows, columns=["sessionid_chat", "sessionid_manual", "comment", "email"],
+    )
+    await conn.copy_records_to_table(
+        "assignee", records=assignee_rows,
+        columns=["sessionid_chat", "sessionid_manual", "name", "email", "status"],
+    )
+    # Completed records were copied into the default partitions; give each month its own
+    await partitions.maintain(conn)
+    await conn.execute("ANALYZE")
+    return {"chat": chat, "manual": manual, "comments": len(comment_rows), "assignees": len(assignee_rows)}
+
+
+def add_pg_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--pg-host", default=os.getenv("PGHOST", "127.0.0.1"))
+    parser.add_argument("--pg-port", type=int, default=int(os.getenv("PGPORT", 5432)))
+    parser.add_argument("--pg-user", default=os.getenv("PGUSER", "postgres"))
+    parser.add_argument("--pg-password", default=os.getenv("PGPASSWORD", "postgres"))
+    parser.add_argument("--pg-database", default=os.getenv("PGDATABASE", "abot_bench"))
+
+
+def add_seed_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--chat", type=int, default=20000, help="number of chat records")
+    parser.add_argument("--manual", type=int, default=5000, help="number of manual records")
+    parser.add_argument("--comments", type=float, default=1.5, help="mean comments per session")
+    parser.add_argument("--assigned", type=float, default=0.6, help="fraction of sessions with an assignee")
+    parser.add_argument("--days", type=int, default=365, help="spread of record timestamps")
+    parser.add_argument("--seed", type=int, default=42)
+
+
+async def _main(args):
+    conn = await connect(args)
+    try:
+        await apply_schema(conn)
+        print(await seed(conn, args.chat, args.manual, args.comments, args.assigned, args.days, args.seed))
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_pg_arguments(parser)
+    add_seed_arguments(parser)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,89 @@
+"""Scripted request generators and the mixes that weight them.
+
+Each generator returns ``(endpoint, method, path, params, json)``; ``endpoint``
+is the route template results are grouped by.
+"""
+import random
+
+from bench.seed import FIRST_NAMES, SEVERITIES, STATUSES, TEAMS
+
+
+class Context:
+    def __init__(self, chat_ids, manual_ids, admin_sid):
+        self.ids = {"chat": [str(i) for i in chat_ids], "manual": [str(i) for i in manual_ids]}
+        self.admin_sid = admin_sid
+
+    def session(self, rng: random.Random):
+        flag = rng.choices(["chat", "manual"], weights=[len(self.ids["chat"]), len(self.ids["manual"])])[0]
+        return rng.choice(self.ids[flag]), flag
+
+
+def list_polling(rng: random.Random, ctx: Context):
+    params = {"team": rng.choice(TEAMS), "page": 1 if rng.random() < 0.8 else rng.randint(2, 10),
+              "limit": 10, "history": "false"}
+    if rng.random() < 0.1:
+        params["search"] = rng.choice(FIRST_NAMES)
+    return "GET /session-data", "GET", "/session-data", params, None
+
+
+def detail_view(rng: random.Random, ctx: Context):
+    sid, flag = ctx.session(rng)
+    return "GET /session", "GET", "/session", {"sid": sid, "flag": flag}, None
+
+
+def triage(rng: random.Random, ctx: Context):
+    sid, flag = ctx.session(rng)
+    action = rng.randrange(7)
+    if action == 0:
+        return ("PUT /update-chat-urgency", "PUT", "/update-chat-urgency",
+                {"sid": sid, "urgency": rng.choice(SEVERITIES), "flag": flag}, None)
+    if action == 1:
+        return ("PUT /update-chat-team", "PUT", "/update-chat-team",
+                {"sid": sid, "team": rng.choice(TEAMS), "flag": flag}, None)
+    if action == 2:
+        return ("POST /session/assign", "POST", "/session/assign",
+                {"request_id": sid, "name": "Bench User", "email": "bench@example.com", "flag": flag}, None)
+    if action == 3:
+        return ("PUT /session/status", "PUT", "/session/status",
+                {"request_id": sid, "status": rng.choice(STATUSES), "flag": flag}, None)
+    if action == 4:
+        return ("POST /session/{sid}/comments", "POST", f"/session/{sid}/comments",
+                {"email": "bench@example.com", "flag": flag}, {"comment": "Benchmark comment"})
+    if action == 5:
+        return ("POST /take-action", "POST", "/take-action",
+                {"sid": sid, "action_taken_notes": "Called back", "mark_as_complete": "true", "flag": flag}, None)
+    return "POST /reopen-request", "POST", "/reopen-request", {"sid": sid, "flag": flag}, None
+
+
+def admin_search(rng: random.Random, ctx: Context):
+    params = {"sid": ctx.admin_sid, "search": rng.choice(["bench", "user", "1", "2"]), "per_page": 10}
+    return "GET /search_users", "GET", "/search_users", params, None
+
+
+GENERATORS = {
+    "list": list_polling,
+    "detail": detail_view,
+    "triage": triage,
+    "admin": admin_search,
+}
+
+MIXES = {
+    "default": {"list": 50, "detail": 30, "triage": 15, "admin": 5},
+    "polling": {"list": 100},
+    "detail": {"detail": 100},
+    "triage": {"triage": 100},
+    "admin": {"admin": 100},
+}
+
+
+def parse_mix(value: str) -> dict:
+    """Accepts a named mix or ``list=60,detail=30,triage=10``."""
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in GENERATORS:
+            raise ValueError(f"Unknown workload {name!r}, expected one of {sorted(GENERATORS)}")
+        mix[name] = float(weight or 1)
+    return mix
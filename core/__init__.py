@@ -1,2 +1,3 @@
-from core.functions import generate_password, _get_user_roles, fetch_role_id
+from core.functions import generate_password, _get_user_roles, fetch_role_id, http_session, close_http_session, \
+    get_management_token, management_token_ready
 from core.utils import VerifyToken
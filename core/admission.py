@@ -0,0 +1,139 @@
+import asyncio
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, Request, Security, status
+
+from core.metrics import Counter, Gauge
+
+IN_FLIGHT = Gauge("admission_in_flight", "Requests holding an admission slot", ["endpoint"])
+QUEUED = Gauge("admission_queued", "Requests waiting for an admission slot", ["endpoint"])
+SHED = Counter("admission_shed_total", "Requests rejected with 503, by reason", ["endpoint", "reason"])
+DISCONNECTED = Counter("requests_cancelled_total", "Requests whose work was cancelled because the client left",
+                       ["endpoint"])
+
+
+class OverloadedException(HTTPException):
+    def __init__(self, retry_after: int):
+        """Returns HTTP 503 with Retry-After"""
+        super().__init__(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, retry later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class ClientDisconnected(HTTPException):
+    def __init__(self):
+        super().__init__(499, detail="Client closed request")
+
+
+class AdmissionLimiter:
+    """Bounds concurrent requests to one endpoint in this worker.
+
+    Up to ``max_concurrent`` requests run at once and up to ``max_queue`` wait
+    for a slot, each for at most ``queue_timeout`` seconds. A single caller may
+    hold at most ``per_user`` running or queued requests, so one user cannot
+    fill the queue for everyone else. Anything beyond that is shed with 503.
+    """
+
+    def __init__(self, endpoint: str, max_concurrent: int, max_queue: int, queue_timeout: float,
+                 per_user: int, retry_after: int = 1):
+        self.endpoint = endpoint
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.per_user = per_user
+        self.retry_after = retry_after
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._queued = 0
+        self._in_flight = 0
+        self._by_user = defaultdict(int)
+
+    def _shed(self, reason: str):
+        SHED.inc(endpoint=self.endpoint, reason=reason)
+        raise OverloadedException(self.retry_after)
+
+    async def _queue_for_slot(self):
+        self._queued += 1
+        QUEUED.set(self._queued, endpoint=self.endpoint)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._shed("queue_timeout")
+        finally:
+            self._queued -= 1
+            QUEUED.set(self._queued, endpoint=self.endpoint)
+
+    @asynccontextmanager
+    async def share(self, user):
+        """Counts a request against ``user``'s share, shedding it if they already
+        hold ``per_user`` requests. Takes no slot."""
+        if self.per_user and self._by_user.get(user, 0) >= self.per_user:
+            self._shed("user_limit")
+
+        self._by_user[user] += 1
+        try:
+            yield
+        finally:
+            self._by_user[user] -= 1
+            if not self._by_user[user]:
+                del self._by_user[user]
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds one of the ``max_concurrent`` slots, queueing for it if need be."""
+        if self._slots.locked() and self._queued >= self.max_queue:
+            self._shed("queue_full")
+
+        if self._slots.locked():
+            await self._queue_for_slot()
+        else:
+            # A free slot is taken without suspending, so requests arriving
+            # in the same burst already see it as taken
+            await self._slots.acquire()
+
+        self._in_flight += 1
+        IN_FLIGHT.set(self._in_flight, endpoint=self.endpoint)
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            IN_FLIGHT.set(self._in_flight, endpoint=self.endpoint)
+            self._slots.release()
+
+    @asynccontextmanager
+    async def admit(self, user):
+        """Counts the request against ``user``'s share and holds a slot for it."""
+        async with self.share(user), self.slot():
+            yield
+
+
+def admission(limiter: AdmissionLimiter, verify):
+    """Builds a route dependency that holds a slot of ``limiter`` for the request,
+    with the JWT subject as the fair-share key."""
+
+    async def dependency(auth_result: dict = Security(verify)):
+        async with limiter.admit(auth_result.get("sub")):
+            yield
+
+    return dependency
+
+
+async def cancel_on_disconnect(request: Request, awaitable, endpoint: str, poll_interval: float = 0.1):
+    """Awaits ``awaitable``, cancelling it if the client disconnects first.
+
+    Cancelling an asyncpg query sends a cancel request to Postgres, so the
+    database stops working on a response nobody will read.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                DISCONNECTED.inc(endpoint=endpoint)
+                raise ClientDisconnected
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import datetime, timezone
+
+from core.db import primary_pool
+from core.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["occurred_at", "actor", "action", "sessionid", "flag", "before", "after"]
+
+RECORDED = Counter("audit_events_recorded_total", "Audit events queued")
+DROPPED = Counter("audit_events_dropped_total", "Audit events dropped because the queue was full")
+WRITTEN = Counter("audit_events_written_total", "Audit events written to the database")
+FAILED = Counter("audit_events_failed_total", "Audit events lost to failed flushes")
+
+
+def split_change(row) -> tuple:
+    """Splits a row returned by an audited UPDATE into (before, after).
+
+    Columns prefixed with ``old_`` hold the values before the update, the
+    others the values after it.
+    """
+    before, after = {}, {}
+    for key, value in dict(row).items():
+        if key.startswith("old_"):
+            before[key[4:]] = value
+        else:
+            after[key] = value
+    return before, after
+
+
+class AuditTrail:
+    """Queues audit events in memory and writes them behind the request with COPY.
+
+    The queue is bounded: when it is full new events are dropped and counted
+    rather than slowing the mutation down.
+    """
+
+    def __init__(self, max_queue: int = 10000, batch_size: int = 500, flush_interval: float = 1.0):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = deque()
+        self._wake = asyncio.Event()
+        self._closed = False
+
+    def record(self, actor, action: str, sessionid, flag: str, before=None, after=None):
+        if len(self._queue) >= self.max_queue:
+            DROPPED.inc()
+            return
+        self._queue.append((
+            datetime.now(timezone.utc),
+            actor,
+            action,
+            sessionid,
+            flag,
+            json.dumps(before, default=str) if before is not None else None,
+            json.dumps(after, default=str) if after is not None else None,
+        ))
+        RECORDED.inc()
+        if len(self._queue) >= self.batch_size:
+            self._wake.set()
+
+    async def run(self):
+        """Flushes every ``flush_interval`` seconds, or as soon as a batch is full."""
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Writes the queue in batches. A failed batch is dropped and counted, so
+        one bad connection cannot stop the writer or block shutdown."""
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            try:
+                async with primary_pool().acquire() as conn:
+                    await conn.copy_records_to_table("audit_events", records=batch, columns=COLUMNS)
+                WRITTEN.inc(len(batch))
+            except Exception as error:
+                logger.error("Dropping %d audit events: %s", len(batch), error)
+                FAILED.inc(len(batch))
+
+    async def close(self, task: asyncio.Task):
+        """Stops the flush loop after its current batch and writes whatever is still queued."""
+        self._closed = True
+        self._wake.set()
+        await task
+        await self.flush()
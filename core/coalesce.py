@@ -0,0 +1,70 @@
+import asyncio
+
+from core.metrics import Counter
+
+CALLS = Counter("coalesce_calls_total", "Coalesced reads, by endpoint and whether the call ran the query",
+                ["endpoint", "role"])
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Shares one in-flight execution between concurrent calls with the same key.
+
+    The first caller (the leader) starts the work; callers arriving before it
+    finishes await the same result or exception. The work is only cancelled
+    once every caller waiting for it has been cancelled. Results are shared,
+    so callers must not mutate them.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self._flights = {}
+
+    async def do(self, key, fn, retry_on=()):
+        """Returns the result of ``fn()``, shared with concurrent calls for ``key``.
+
+        Exceptions of the ``retry_on`` types are not shared: a follower that
+        gets one from the leader's call starts over, joining or leading a
+        new flight, and only the caller whose own ``fn`` raised it sees it.
+        """
+        while True:
+            flight = self._flights.get(key)
+            # A finished flight may not have been forgotten yet, and retrying
+            # on it would spin without ever yielding to the event loop
+            leader = flight is None or flight.task.done()
+            if leader:
+                flight = _Flight(asyncio.ensure_future(fn()))
+                self._flights[key] = flight
+                flight.task.add_done_callback(lambda _, flight=flight: self._forget(key, flight))
+                CALLS.inc(endpoint=self.endpoint, role="leader")
+            else:
+                CALLS.inc(endpoint=self.endpoint, role="follower")
+
+            try:
+                return await self._wait(key, flight)
+            except retry_on:
+                if leader:
+                    raise
+
+    async def _wait(self, key, flight: _Flight):
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Forget the flight first: the task may take a while to unwind
+                # (asyncpg sends a cancel request) and new callers must not join it
+                self._forget(key, flight)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
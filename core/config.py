@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Optional
 
 from pydantic_settings import BaseSettings
 
@@ -9,6 +10,50 @@ class Settings(BaseSettings):
     auth0_issuer: str
     auth0_algorithms: str
 
+    # Sampling profiler, disabled unless a rate or a debug token is set
+    profile_sample_rate: float = 0.0
+    profile_token: Optional[str] = None
+    profile_interval: float = 0.005
+    profile_dir: str = "profiles"
+
+    # Per-worker pool sizes, exported by gunicorn.conf.py from the global budgets
+    db_pool_min_size: int = 2
+    db_pool_max_size: int = 10
+    http_pool_size: int = 20
+    db_replica_pool_max_size: int = 10
+
+    # Optional read replica; reads fall back to the primary when it is unset
+    pg_replica_host: Optional[str] = None
+    pg_replica_port: Optional[int] = None
+    replica_max_lag_seconds: float = 5.0
+    replica_check_interval: float = 5.0
+
+    # Audit trail write-behind queue
+    audit_queue_size: int = 10000
+    audit_batch_size: int = 500
+    audit_flush_interval: float = 1.0
+
+    # Admission control per endpoint class, per worker
+    list_concurrency: int = 8
+    list_queue: int = 32
+    detail_concurrency: int = 16
+    detail_queue: int = 64
+    write_concurrency: int = 16
+    write_queue: int = 64
+    admission_queue_timeout: float = 2.0
+    admission_per_user: int = 4
+    admission_retry_after: int = 1
+    # How long an admitted request waits for a pooled connection before it is
+    # shed; the limits above add up to more than a worker's pool
+    db_acquire_timeout: float = 2.0
+
+    # Postgres statement_timeout: the pool default, and the longer one for list queries
+    statement_timeout_ms: int = 2000
+    list_statement_timeout_ms: int = 5000
+
+    # How long startup waits for the JWKS and Auth0 token before serving cold
+    warmup_timeout: float = 10.0
+
     class Config:
         env_file = ".env"
 
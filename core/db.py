@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import asyncpg
+
+from core.admission import OverloadedException
+from core.config import get_settings
+from core.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[asyncpg.Pool] = None
+_replica_pool: Optional[asyncpg.Pool] = None
+_replica_healthy = False
+# WAL position the replica had replayed at its last check; only ever behind the real one
+_replica_lsn = 0
+_hot_statements = ()
+
+ROUTED = Counter("db_route_total", "Routing decisions, by target pool and reason", ["target", "reason"])
+REPLICA_LAG = Gauge("db_replica_lag_seconds", "Replay lag of the read replica as last measured")
+REPLICA_UP = Gauge("db_replica_up", "1 if the last replica lag check succeeded")
+ACQUIRE_TIMEOUTS = Counter("db_acquire_timeouts_total", "Requests shed because no pooled connection freed up in time")
+
+REPLICA_STATE_QUERY = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END AS lag, pg_last_wal_replay_lsn()::text AS replay_lsn
+"""
+
+
+def parse_lsn(value: Optional[str]) -> Optional[int]:
+    """Parses a Postgres LSN such as ``16/B374D848``; None if it is missing or malformed."""
+    try:
+        high, low = value.split("/")
+        return (int(high, 16) << 32) | int(low, 16)
+    except (AttributeError, ValueError):
+        return None
+
+
+async def _prepare(conn: asyncpg.Connection):
+    for query, args in _hot_statements:
+        await conn.fetch(query, *args)
+
+
+async def _open_replica_pool():
+    global _replica_pool, _replica_healthy
+    settings = get_settings()
+    _replica_pool = await asyncpg.create_pool(
+        user=os.getenv("PGUSER"),
+        password=os.getenv("PGPASSWORD"),
+        database=os.getenv("PGDATABASE"),
+        host=settings.pg_replica_host,
+        port=settings.pg_replica_port,
+        min_size=min(settings.db_pool_min_size, settings.db_replica_pool_max_size),
+        max_size=settings.db_replica_pool_max_size,
+        init=_prepare,
+        timeout=settings.replica_check_interval,
+        server_settings={"statement_timeout": str(settings.statement_timeout_ms)},
+    )
+    _replica_healthy = True
+
+
+async def _open_primary_pool():
+    global _pool
+    settings = get_settings()
+    _pool = await asyncpg.create_pool(
+        user=os.getenv("PGUSER"),
+        password=os.getenv("PGPASSWORD"),
+        database=os.getenv("PGDATABASE"),
+        host=os.getenv("PGHOST"),
+        min_size=settings.db_pool_min_size,
+        max_size=settings.db_pool_max_size,
+        init=_prepare,
+        timeout=settings.warmup_timeout,
+        server_settings={"statement_timeout": str(settings.statement_timeout_ms)},
+    )
+
+
+async def _keep_trying_primary(retry_interval: float):
+    while _pool is None:
+        await asyncio.sleep(retry_interval)
+        try:
+            await _open_primary_pool()
+            logger.info("Database pool open")
+        except Exception as error:
+            logger.warning("Database still unavailable: %s", error)
+
+
+async def open_pool(hot_statements=(), retry_interval: float = 5.0) -> Optional[asyncio.Task]:
+    """Creates this worker's connection pools, sized by the gunicorn budget.
+
+    ``hot_statements`` are ``(query, args)`` pairs run once on every new
+    connection so they sit in its statement cache before the first request.
+    They must be read-only. A replica pool is opened as well when
+    ``PG_REPLICA_HOST`` is set; if the replica is unreachable the worker
+    starts without it and ``monitor_replica`` keeps trying.
+
+    A failure to open the primary pool does not stop the worker either: it
+    boots unready (see ``pools_ready``) and the returned task retries every
+    ``retry_interval`` seconds until the pool opens. None if it opened now.
+    """
+    global _hot_statements
+    settings = get_settings()
+    _hot_statements = tuple(hot_statements)
+
+    retry = None
+    try:
+        await _open_primary_pool()
+    except Exception as error:
+        logger.error("Database unavailable, retrying every %ss: %s", retry_interval, error)
+        retry = asyncio.create_task(_keep_trying_primary(retry_interval))
+    if settings.pg_replica_host:
+        try:
+            await _open_replica_pool()
+        except Exception as error:
+            logger.warning("Replica unavailable, reading from the primary until it is back: %s", error)
+    return retry
+
+
+async def close_pool():
+    """Waits for checked-out connections to be released, then closes the pools."""
+    global _pool, _replica_pool
+    if _replica_pool is not None:
+        await _replica_pool.close()
+        _replica_pool = None
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def pools_ready() -> bool:
+    """True once the primary pool has open connections. The replica is
+    optional: reads fall back to the primary while it is down."""
+    return _pool is not None and _pool.get_size() > 0
+
+
+def primary_pool() -> asyncpg.Pool:
+    """Returns the primary pool directly, without counting a routing decision."""
+    if _pool is None:
+        raise RuntimeError("Database pool is not open")
+    return _pool
+
+
+def _route(read: bool, after: Optional[int]) -> str:
+    if not read:
+        return "write"
+    if not get_settings().pg_replica_host:
+        return "no_replica"
+    if _replica_pool is None or not _replica_healthy:
+        return "replica_down"
+    if after is not None and after > _replica_lsn:
+        return "catching_up"
+    return "read"
+
+
+def get_pool(read: bool = False, after: Optional[int] = None) -> asyncpg.Pool:
+    """Returns the pool a query should run on.
+
+    Reads go to the replica unless it is missing, lagging or failing, or
+    ``after`` is a WAL position (from ``write_position``) the replica has not
+    replayed yet, which gives a client read-your-writes across workers.
+    """
+    pool = primary_pool()
+    reason = _route(read, after)
+    target = "replica" if reason == "read" else "primary"
+    ROUTED.inc(target=target, reason=reason)
+    return _replica_pool if target == "replica" else pool
+
+
+async def write_position(conn: asyncpg.Connection) -> str:
+    """Returns the primary's WAL position after a committed write, for the client
+    to send back with its next reads."""
+    return await conn.fetchval("SELECT pg_current_wal_lsn()::text")
+
+
+@asynccontextmanager
+async def acquire(pool: asyncpg.Pool, statement_timeout_ms: Optional[int] = None):
+    """Acquires a connection, overriding the pool's statement_timeout if asked.
+
+    Waiting for a free connection is bounded by ``db_acquire_timeout``, after
+    which the request is shed with 503 like any other overload. The override
+    costs one round trip and is undone by the pool's reset on release, so
+    only query classes that differ from the default pay for it.
+    """
+    settings = get_settings()
+    try:
+        conn = await pool.acquire(timeout=settings.db_acquire_timeout)
+    except asyncio.TimeoutError:
+        ACQUIRE_TIMEOUTS.inc()
+        raise OverloadedException(settings.admission_retry_after)
+    try:
+        if statement_timeout_ms is not None and statement_timeout_ms != settings.statement_timeout_ms:
+            await conn.execute(f"SET statement_timeout = {int(statement_timeout_ms)}")
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+async def monitor_replica():
+    """Measures replica lag and replay position periodically, and stops routing
+    reads to the replica while it is unreachable or further behind than
+    ``replica_max_lag_seconds``. Opens the replica pool if that failed at boot."""
+    global _replica_healthy, _replica_lsn
+    settings = get_settings()
+    while True:
+        try:
+            if _replica_pool is None:
+                await _open_replica_pool()
+            state = await _replica_pool.fetchrow(REPLICA_STATE_QUERY, timeout=settings.replica_check_interval)
+            lag = float(state["lag"])
+            REPLICA_LAG.set(lag)
+            REPLICA_UP.set(1)
+            _replica_lsn = parse_lsn(state["replay_lsn"]) or 0
+            _replica_healthy = lag <= settings.replica_max_lag_seconds
+        except Exception as error:
+            logger.warning("Replica check failed: %s", error)
+            REPLICA_UP.set(0)
+            _replica_healthy = False
+        await asyncio.sleep(settings.replica_check_interval)
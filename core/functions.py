@@ -1,10 +1,35 @@
+import asyncio
 import json
 import os
 import random
 import string
+import time
 
 import aiohttp
 
+from core.config import get_settings
+
+_http_session = None
+_management_token = None
+_management_token_expiry = 0.0
+_management_token_lock = asyncio.Lock()
+
+
+def http_session() -> aiohttp.ClientSession:
+    """Returns the worker's shared session, so Auth0 connections are pooled and reused."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(limit=get_settings().http_pool_size)
+        _http_session = aiohttp.ClientSession(connector=connector)
+    return _http_session
+
+
+async def close_http_session():
+    global _http_session
+    if _http_session is not None:
+        await _http_session.close()
+        _http_session = None
+
 
 async def generate_password(length=12):
     while True:
@@ -15,8 +40,16 @@ async def generate_password(length=12):
             return password
 
 
-async def _get_user_roles(sid):
-    async with aiohttp.ClientSession() as session:
+async def get_management_token(min_ttl: float = 0.0):
+    """Returns a cached Management API token, fetching a new one shortly before expiry.
+
+    A token with less than ``min_ttl`` seconds left is replaced early.
+    """
+    global _management_token, _management_token_expiry
+    async with _management_token_lock:
+        if management_token_ttl() > min_ttl:
+            return _management_token
+        session = http_session()
         payload = json.dumps({
             "client_id": os.getenv('AUTH0_CLIENT_ID'),
             "client_secret": os.getenv('AUTH0_CLIENT_SECRET'),
@@ -29,14 +62,33 @@ async def _get_user_roles(sid):
                                 headers=headers) as response:
             json_data = await response.json()
 
-        url = f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/users/{sid}/roles"
-        headers = {
-            'Accept': 'application/json',
-            'Authorization': f"Bearer {json_data.get('access_token')}"
-        }
+        _management_token = json_data.get('access_token')
+        _management_token_expiry = time.monotonic() + json_data.get('expires_in', 86400) - 60
+        return _management_token
+
+
+def management_token_ttl() -> float:
+    """Seconds the cached token can still be used for, 0 if there is none."""
+    if _management_token is None:
+        return 0.0
+    return max(0.0, _management_token_expiry - time.monotonic())
+
+
+def management_token_ready():
+    return management_token_ttl() > 0
+
+
+async def _get_user_roles(sid):
+    session = http_session()
+    token = await get_management_token()
+    url = f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/users/{sid}/roles"
+    headers = {
+        'Accept': 'application/json',
+        'Authorization': f"Bearer {token}"
+    }
 
-        async with session.get(url, headers=headers) as response:
-            return await response.text(), json_data.get('access_token')
+    async with session.get(url, headers=headers) as response:
+        return await response.text(), token
 
 
 async def create_name_to_id_mapping_async(data):
@@ -48,14 +100,14 @@ async def fetch_id_by_name_async(name_to_id_mapping, name):
 
 
 async def fetch_role_id(role, token):
-    async with aiohttp.ClientSession() as session:
-        url = f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/roles"
-        payload = {}
-        headers = {
-            'Accept': 'application/json',
-            'Authorization': f'Bearer {token}'
-        }
-        async with session.get(url, headers=headers) as response:
-            name_to_id_mapping = await create_name_to_id_mapping_async(await response.json())
-            found_id = await fetch_id_by_name_async(name_to_id_mapping, role)
-            return found_id
+    session = http_session()
+    url = f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/roles"
+    payload = {}
+    headers = {
+        'Accept': 'application/json',
+        'Authorization': f'Bearer {token}'
+    }
+    async with session.get(url, headers=headers) as response:
+        name_to_id_mapping = await create_name_to_id_mapping_async(await response.json())
+        found_id = await fetch_id_by_name_async(name_to_id_mapping, role)
+        return found_id
@@ -0,0 +1,56 @@
+import os
+from collections import defaultdict
+
+_registry = []
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = defaultdict(float)
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def get(self, **labels) -> float:
+        return self.values[self._key(labels)]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        self.values[self._key(labels)] += amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+
+def render() -> str:
+    """Renders every metric of this worker in the Prometheus text format.
+
+    Values live in the worker's own memory, and under gunicorn each scrape is
+    answered by whichever worker accepts it. Every sample therefore carries a
+    ``worker`` label with the worker's pid, so each series stays one worker's
+    monotonic counter instead of jumping between workers' values. Aggregate
+    over it in queries, e.g. ``sum without (worker) (rate(...[5m]))``; a
+    recycled worker shows up as a new series.
+    """
+    worker = f'worker="{os.getpid()}"'
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key, value in metric.values.items():
+            labels = ",".join([f'{name}="{label}"' for name, label in zip(metric.labelnames, key)] + [worker])
+            lines.append(f"{metric.name}{{{labels}}} {value}")
+    return "\n".join(lines) + "\n"
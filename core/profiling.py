@@ -0,0 +1,106 @@
+import asyncio
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from uuid import uuid4
+
+PROFILE_HEADER = b"x-debug-profile"
+
+
+class StackSampler(threading.Thread):
+    """Samples the stack of one thread at a fixed interval.
+
+    If ``task`` is given, only samples taken while it is the current task of
+    ``loop`` are kept, so other requests and idle loop time are left out.
+    Stacks are aggregated in the folded format ("outer;inner count") that
+    flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, thread_id: int, interval: float, loop=None, task=None):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.loop = loop
+        self.task = task
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            if self.task is not None and asyncio.current_task(self.loop) is not self.task:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                module = frame.f_globals.get("__name__", "?")
+                stack.append(f"{module}:{getattr(code, 'co_qualname', code.co_name)}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class ProfilerMiddleware:
+    """Profiles a sampled fraction of requests, or any request carrying the
+    debug header with the configured token.
+
+    The profile is written to ``directory`` and its file name is returned in
+    the ``X-Profile`` response header. It only covers time the event loop
+    spent running the request's own task: concurrent requests, idle time and
+    work the request hands to other tasks (e.g. a coalesced query) are not
+    included. Only add this middleware when
+    profiling is enabled; it is not installed otherwise.
+    """
+
+    def __init__(self, app, sample_rate: float = 0.0, token: str = None, interval: float = 0.005,
+                 directory: str = "profiles"):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.token = token.encode() if token else None
+        self.interval = interval
+        self.directory = directory
+
+    def _should_profile(self, scope) -> bool:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"].strip("/").replace("/", "_") or "root"
+        filename = f"{int(time.time() * 1000)}-{scope['method']}-{path}-{uuid4().hex[:8]}.folded"
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile", filename.encode())]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), self.interval, asyncio.get_running_loop(),
+                               asyncio.current_task())
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_header)
+        finally:
+            sampler.stop()
+            await asyncio.to_thread(self._write, filename, sampler.folded())
+
+    def _write(self, filename: str, folded: str):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, filename), "w") as f:
+            f.write(folded)
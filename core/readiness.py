@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import time
+
+from core.db import pools_ready
+from core.functions import get_management_token, management_token_ready, management_token_ttl
+
+logger = logging.getLogger(__name__)
+
+
+async def _warm(auth):
+    if not auth.keys_loaded:
+        await asyncio.to_thread(auth.prefetch_keys)
+    if not management_token_ready():
+        await get_management_token()
+
+
+async def _keep_warm(auth, retry_interval: float, refresh_margin: float):
+    """Retries whatever warm-up missed, then keeps it warm: the JWKS is refetched
+    halfway through its cache lifespan, so ``verify`` never fetches it with
+    blocking I/O on the event loop, and the Management API token is replaced
+    ``refresh_margin`` seconds before it expires, so readiness does not lapse
+    on a worker that sees no admin traffic."""
+    keys_due = time.monotonic() + auth.keys_lifespan / 2
+    while True:
+        try:
+            if auth.keys_loaded and time.monotonic() >= keys_due:
+                await asyncio.to_thread(auth.prefetch_keys, True)
+                keys_due = time.monotonic() + auth.keys_lifespan / 2
+            await _warm(auth)
+            await get_management_token(min_ttl=refresh_margin)
+            delay = max(retry_interval, min(management_token_ttl() - refresh_margin, keys_due - time.monotonic()))
+        except Exception as error:
+            logger.warning("Warm-up refresh failed: %s", error)
+            delay = retry_interval
+        await asyncio.sleep(delay)
+
+
+async def warm_up(auth, timeout: float, retry_interval: float = 5.0, refresh_margin: float = 300.0):
+    """Fetches the JWKS and the Management API token before the worker serves.
+
+    If that does not finish within ``timeout`` the worker starts anyway and
+    readiness stays false until it succeeds. The returned task keeps retrying
+    and refreshes the token before it expires; cancel it at shutdown.
+    """
+    try:
+        await asyncio.wait_for(_warm(auth), timeout)
+    except Exception as error:
+        logger.warning("Warm-up incomplete, retrying in the background: %s", error)
+    return asyncio.create_task(_keep_warm(auth, retry_interval, refresh_margin))
+
+
+def readiness_checks(auth) -> dict:
+    """Reports dependency state from in-process flags, without any network calls."""
+    return {
+        "database": pools_ready(),
+        "jwks": auth.keys_loaded,
+        "auth0_token": management_token_ready(),
+    }
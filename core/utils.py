@@ -30,7 +30,16 @@ class VerifyToken:
         # This gets the JWKS from a given URL and does processing so you can
         # use any of the keys available
         jwks_url = f'https://{self.config.auth0_domain}/.well-known/jwks.json'
-        self.jwks_client = jwt.PyJWKClient(jwks_url)
+        # Seconds the fetched JWKS is cached before verify() would refetch it
+        self.keys_lifespan = 300.0
+        self.jwks_client = jwt.PyJWKClient(jwks_url, lifespan=self.keys_lifespan)
+        self.keys_loaded = False
+
+    def prefetch_keys(self, refresh: bool = False):
+        """Fetches the JWKS up front so the first request does not pay for it.
+        Blocking; ``refresh`` refetches it even while the cached copy is fresh."""
+        self.jwks_client.get_signing_keys(refresh=refresh)
+        self.keys_loaded = True
 
         # 👇 new code
 
@@ -1,12 +1,46 @@
 # Gunicorn configuration file
 import multiprocessing
+import os
 
+# Each worker owns its own DB and HTTP pools, so worker count and pool sizes
+# are carved out of global budgets instead of multiplying with the host size.
+# Keep DB_CONNECTION_BUDGET below Postgres max_connections minus headroom for
+# migrations, admin sessions and other clients.
+db_connection_budget = int(os.getenv("DB_CONNECTION_BUDGET", 40))
+db_replica_connection_budget = int(os.getenv("DB_REPLICA_CONNECTION_BUDGET", db_connection_budget))
+http_connection_budget = int(os.getenv("HTTP_CONNECTION_BUDGET", 100))
+min_db_connections_per_worker = int(os.getenv("DB_POOL_MIN_PER_WORKER", 5))
+
+# Async workers are not CPU bound per request, so one per core is enough and
+# fewer if the budget cannot give each of them a useful pool.
+workers = int(os.getenv("WEB_CONCURRENCY", 0)) or max(
+    1, min(multiprocessing.cpu_count(), db_connection_budget // min_db_connections_per_worker)
+)
+# Every worker needs at least one connection, so never run more workers than
+# the budgets allow, even if WEB_CONCURRENCY asks for it.
+connection_budgets = [db_connection_budget]
+if os.getenv("PG_REPLICA_HOST"):
+    connection_budgets.append(db_replica_connection_budget)
+workers = max(1, min([workers] + connection_budgets))
+
+db_pool_max_size = max(1, db_connection_budget // workers)
+os.environ["DB_POOL_MAX_SIZE"] = str(db_pool_max_size)
+os.environ["DB_POOL_MIN_SIZE"] = str(min(int(os.getenv("DB_POOL_MIN_SIZE", 2)), db_pool_max_size))
+os.environ["DB_REPLICA_POOL_MAX_SIZE"] = str(max(1, db_replica_connection_budget // workers))
+os.environ["HTTP_POOL_SIZE"] = str(max(1, http_connection_budget // workers))
+
+# Import the app once in the master so workers share its memory copy-on-write.
+# Pools are opened in the app lifespan, i.e. after the fork, in each worker.
+preload_app = True
+
+# Recycle workers to bound memory growth. A recycled worker stops accepting
+# connections and uvicorn drains its in-flight requests before it exits; the
+# jitter keeps workers from recycling at the same time.
 max_requests = 1000
-max_requests_jitter = 50
+max_requests_jitter = 200
 
 log_file = "-"
 
 bind = "0.0.0.0:8000"
 
 worker_class = "uvicorn.workers.UvicornWorker"
-workers = (multiprocessing.cpu_count() * 2) + 1
@@ -1,24 +1,100 @@
+import asyncio
 import json
 import os
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Optional
 from uuid import UUID
 
-import aiohttp
-import asyncpg
 from dotenv import load_dotenv
-from fastapi import FastAPI, Security
+from asyncpg.exceptions import QueryCanceledError
+from fastapi import Depends, FastAPI, Request, Security
 from fastapi import HTTPException, Query, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.security import HTTPBearer  # 👈 new code
 from pydantic import BaseModel
 
-from core import generate_password, _get_user_roles, fetch_role_id
+from core import generate_password, _get_user_roles, fetch_role_id, http_session, close_http_session
+from core.admission import AdmissionLimiter, OverloadedException, admission, cancel_on_disconnect
+from core.audit import AuditTrail, split_change
+from core.coalesce import SingleFlight
+from core.config import get_settings
+from core.db import open_pool, close_pool, get_pool, monitor_replica, acquire, parse_lsn, write_position
+from core.metrics import render as render_metrics
+from core.profiling import ProfilerMiddleware
+from core.readiness import warm_up, readiness_checks
 from core.utils import VerifyToken  # 👈 Import the new class
 
 load_dotenv(dotenv_path=".venv/.env")
-app = FastAPI()
+NIL_UUID = UUID(int=0)
+settings = get_settings()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pool_opener = await open_pool(hot_statements=[(query, (NIL_UUID,)) for query in SESSION_QUERIES.values()])
+    refresher = await warm_up(auth, settings.warmup_timeout)
+    replica_monitor = asyncio.create_task(monitor_replica()) if settings.pg_replica_host else None
+    audit_writer = asyncio.create_task(audit_trail.run())
+    yield
+    for task in (pool_opener, refresher, replica_monitor):
+        if task is not None:
+            task.cancel()
+    try:
+        await audit_trail.close(audit_writer)
+    finally:
+        await close_http_session()
+        await close_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 auth = VerifyToken()
+session_list_flight = SingleFlight("/session-data")
+session_detail_flight = SingleFlight("/session")
+# Per-endpoint admission control, with the JWT subject as the fair-share key.
+# Coalesced reads check the caller's own share before joining a flight, but
+# only the leader takes a slot; if the leader is shed, followers try again
+# rather than share its 503.
+list_limiter = AdmissionLimiter(
+    "/session-data",
+    max_concurrent=settings.list_concurrency,
+    max_queue=settings.list_queue,
+    queue_timeout=settings.admission_queue_timeout,
+    per_user=settings.admission_per_user,
+    retry_after=settings.admission_retry_after,
+)
+detail_limiter = AdmissionLimiter(
+    "/session",
+    max_concurrent=settings.detail_concurrency,
+    max_queue=settings.detail_queue,
+    queue_timeout=settings.admission_queue_timeout,
+    per_user=settings.admission_per_user,
+    retry_after=settings.admission_retry_after,
+)
+# Triage mutations share one limiter
+write_admission = Depends(admission(AdmissionLimiter(
+    "write",
+    max_concurrent=settings.write_concurrency,
+    max_queue=settings.write_queue,
+    queue_timeout=settings.admission_queue_timeout,
+    per_user=settings.admission_per_user,
+    retry_after=settings.admission_retry_after,
+), auth.verify))
+audit_trail = AuditTrail(
+    max_queue=settings.audit_queue_size,
+    batch_size=settings.audit_batch_size,
+    flush_interval=settings.audit_flush_interval,
+)
+
+# The profiler is only installed when enabled so it costs nothing otherwise
+if settings.profile_sample_rate > 0 or settings.profile_token:
+    app.add_middleware(
+        ProfilerMiddleware,
+        sample_rate=settings.profile_sample_rate,
+        token=settings.profile_token,
+        interval=settings.profile_interval,
+        directory=settings.profile_dir,
+    )
 
 # Define your API keys
 
@@ -69,13 +145,56 @@ class AuthError(Exception):
 # 👆 We're continuing from the steps above. Append this to your server.py file.
 
 
-async def get_connection():
-    return await asyncpg.connect(
-        user=os.getenv("PGUSER"),
-        password=os.getenv("PGPASSWORD"),
-        database=os.getenv("PGDATABASE"),
-        host=os.getenv("PGHOST"),
+# Detail queries by flag; they are warmed on every pooled connection at startup
+SESSION_QUERIES = {
+    "manual": """
+        SELECT m.sessionid, m.severity, m.category, m.mark_as_complete, m.request_details, m.action_taken_notes, m.phonenumber,
+               c.comment_id, c.comment, c.email,
+               a.name AS assignee_name, a.email AS assignee_email, a.status AS assignee_status
+        FROM manualrecords m
+        LEFT JOIN comments c ON m.sessionid = c.sessionid_manual
+        LEFT JOIN assignee a ON m.sessionid = a.sessionid_manual
+        WHERE m.sessionid = $1
+        """,
+    "chat": """
+        SELECT r.sessionid, r.severity, r.category, r.mark_as_complete, r.chatsummary, r.chattranscript, r.action_taken_notes, r.phonenumber,
+               c.comment_id, c.comment, c.email,
+               a.name AS assignee_name, a.email AS assignee_email, a.status AS assignee_status
+        FROM chatrecords r
+        LEFT JOIN comments c ON r.sessionid = c.sessionid_chat
+        LEFT JOIN assignee a ON r.sessionid = a.sessionid_chat
+        WHERE r.sessionid = $1
+        """,
+}
+
+
+# Read-your-writes: after a write the client gets the primary's WAL position
+# back and sends it with its next reads, which stay on the primary until the
+# replica has replayed that far and run on their own rather than joining a
+# coalesced query that may have started before the write. Any worker can
+# honour it.
+READ_AFTER_COOKIE = "read_after_lsn"
+READ_AFTER_HEADER = "X-Read-After-LSN"
+
+
+def get_connection(read: bool = False, after: Optional[int] = None):
+    return acquire(get_pool(read=read, after=after))
+
+
+def read_after(request: Request) -> Optional[int]:
+    return parse_lsn(request.headers.get(READ_AFTER_HEADER) or request.cookies.get(READ_AFTER_COOKIE))
+
+
+async def remember_write(conn, response: Response):
+    lsn = await write_position(conn)
+    # Long enough for any flight that started before the write to finish, and
+    # for the replica to catch up; past that it is taken out of rotation anyway
+    max_age = max(
+        settings.admission_queue_timeout + settings.list_statement_timeout_ms / 1000,
+        settings.replica_max_lag_seconds + settings.replica_check_interval,
     )
+    response.set_cookie(READ_AFTER_COOKIE, lsn, max_age=int(max_age) + 1, httponly=True)
+    response.headers[READ_AFTER_HEADER] = lsn
 
 
 @app.get("/")
@@ -83,6 +202,21 @@ async def health_check():
     return {"message": "FastAPI application is running"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    checks = readiness_checks(auth)
+    ready = all(checks.values())
+    return JSONResponse(
+        content={"status": "ready" if ready else "starting", "checks": checks},
+        status_code=200 if ready else 503,
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/create_user")
 async def create_user(
         sid,
@@ -101,45 +235,45 @@ async def create_user(
         "social_care_admin",
         "eip_admin",
     ]:
-        async with aiohttp.ClientSession() as session:
-            password = await generate_password()
-            url = f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/users"
-            payload = json.dumps(
-                {
-                    "email": email,
-                    "blocked": False,
-                    "email_verified": False,
-                    "given_name": name,
-                    "family_name": name,
-                    "user_metadata": {"team": team, "phone_number": contact},
-                    "name": name,
-                    "nickname": name,
-                    "connection": "Username-Password-Authentication",
-                    "password": password,
-                    "verify_email": True,
-                }
-            )
+        session = http_session()
+        password = await generate_password()
+        url = f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/users"
+        payload = json.dumps(
+            {
+                "email": email,
+                "blocked": False,
+                "email_verified": False,
+                "given_name": name,
+                "family_name": name,
+                "user_metadata": {"team": team, "phone_number": contact},
+                "name": name,
+                "nickname": name,
+                "connection": "Username-Password-Authentication",
+                "password": password,
+                "verify_email": True,
+            }
+        )
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Authorization": f"Bearer {token}",
+        }
+        async with session.post(url, data=payload, headers=headers) as response:
+            json_data = await response.json()
+            print(json_data)
+            json_data["password"] = password
+            roles_url = f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/users/{json_data['user_id']}/roles"
+            role_id = await fetch_role_id(role, token)
+            payload = json.dumps({"roles": [role_id]})
             headers = {
                 "Content-Type": "application/json",
-                "Accept": "application/json",
                 "Authorization": f"Bearer {token}",
             }
-            async with session.post(url, data=payload, headers=headers) as response:
-                json_data = await response.json()
-                print(json_data)
-                json_data["password"] = password
-                roles_url = f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/users/{json_data['user_id']}/roles"
-                role_id = await fetch_role_id(role, token)
-                payload = json.dumps({"roles": [role_id]})
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {token}",
-                }
-                async with session.post(
-                        roles_url, data=payload, headers=headers
-                ) as role_response:
-                    json_data["role_status"] = role_response.status
-                    return json_data
+            async with session.post(
+                    roles_url, data=payload, headers=headers
+            ) as role_response:
+                json_data["role_status"] = role_response.status
+                return json_data
     else:
         raise HTTPException(
             status_code=403,
@@ -161,23 +295,23 @@ async def delete_user(sid, delete_sid, auth_result: str = Security(auth.verify))
     ]
             and sid != delete_sid
     ):
-        async with aiohttp.ClientSession() as session:
-            url = f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/users/{delete_sid}"
-            payload = {}
-            headers = {"Authorization": f"Bearer {token}"}
-            async with session.delete(
-                    url, data=payload, headers=headers
-            ) as role_response:
-                if role_response.status == 404:
-                    raise HTTPException(status_code=404, detail="User Not Found!")
-                else:
-                    # status_code = role_response.status
-                    response = Response(content="User deleted successfully!")
-                    response.status_code = 200
-                    return JSONResponse(
-                        content={"message": "User deleted successfully!"},
-                        status_code=200,
-                    )
+        session = http_session()
+        url = f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/users/{delete_sid}"
+        payload = {}
+        headers = {"Authorization": f"Bearer {token}"}
+        async with session.delete(
+                url, data=payload, headers=headers
+        ) as role_response:
+            if role_response.status == 404:
+                raise HTTPException(status_code=404, detail="User Not Found!")
+            else:
+                # status_code = role_response.status
+                response = Response(content="User deleted successfully!")
+                response.status_code = 200
+                return JSONResponse(
+                    content={"message": "User deleted successfully!"},
+                    status_code=200,
+                )
     else:
         raise HTTPException(
             status_code=403,
@@ -193,15 +327,15 @@ async def get_user(sid, search_sid, auth_result: str = Security(auth.verify)):
             role in ["super_admin", "cafd_admin", "social_care_admin", "EIP_admin"]
             or sid == search_sid
     ):
-        async with aiohttp.ClientSession() as session:
-            url = f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/users/{search_sid}"
-            payload = {}
-            headers = {"Accept": "application/json", "Authorization": f"Bearer {token}"}
-            async with session.get(url, data=payload, headers=headers) as response:
-                if response.status == 404:
-                    raise HTTPException(status_code=404, detail="User Not Found!")
-                else:
-                    return await response.json()
+        session = http_session()
+        url = f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/users/{search_sid}"
+        payload = {}
+        headers = {"Accept": "application/json", "Authorization": f"Bearer {token}"}
+        async with session.get(url, data=payload, headers=headers) as response:
+            if response.status == 404:
+                raise HTTPException(status_code=404, detail="User Not Found!")
+            else:
+                return await response.json()
     else:
         raise HTTPException(
             status_code=403,
@@ -252,48 +386,25 @@ async def search_user(
 
     params["q"] = " AND ".join(query)
     print(params["q"])
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers, params=params) as response:
-            if response.status == 200:
-                return await response.json()
-            else:
-                raise HTTPException(
-                    status_code=response.status, detail=await response.json()
-                )
+    session = http_session()
+    async with session.get(url, headers=headers, params=params) as response:
+        if response.status == 200:
+            return await response.json()
+        else:
+            raise HTTPException(
+                status_code=response.status, detail=await response.json()
+            )
 
 
 @app.get("/get_roles")
 async def get_user_roles(sid, auth_result: str = Security(auth.verify)):
-    async with aiohttp.ClientSession() as session:
-        payload = json.dumps(
-            {
-                "client_id": os.getenv("AUTH0_CLIENT_ID"),
-                "client_secret": os.getenv("AUTH0_CLIENT_SECRET"),
-                "audience": f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/",
-                "grant_type": "client_credentials",
-            }
-        )
-        headers = {"content-type": "application/json"}
-
-        async with session.post(
-                f"https://{os.getenv('AUTH0_DOMAIN')}/oauth/token",
-                data=payload,
-                headers=headers,
-        ) as response:
-            json_data = await response.json()
-
-        url = f"https://{os.getenv('AUTH0_DOMAIN')}/api/v2/users/{sid}/roles"
-        headers = {
-            "Accept": "application/json",
-            "Authorization": f"Bearer {json_data.get('access_token')}",
-        }
-
-        async with session.get(url, headers=headers) as response:
-            return await response.text()
+    response, _ = await _get_user_roles(sid)
+    return response
 
 
 @app.get("/session-data")
 async def get_session_data(
+        request: Request,
         team: Optional[str] = None,
         search: Optional[str] = None,
         email: Optional[str] = None,
@@ -337,6 +448,7 @@ async def get_session_data(
     if triaging_confirmed:
         conditions.append(f"combined.triaging_confirmed = '{triaging_confirmed}'")
     if history is not None:
+        # A constant here lets Postgres prune to the *_open or *_done partitions
         conditions.append(f"combined.mark_as_complete = '{history}'")
     if email:
         conditions.append(f"combined.emailorphonenumber = '{email}'")
@@ -344,50 +456,56 @@ async def get_session_data(
         where_clause = " WHERE " + " AND ".join(conditions)
         select_query += where_clause
         count_query += where_clause
-    try:
-        conn = await get_connection()
-        total_count = await conn.fetchval(count_query)
-        select_query += (
-            f" ORDER BY datetimeofchat DESC LIMIT {limit} OFFSET {(page - 1) * limit}"
-        )
-        records = await conn.fetch(select_query)
-        await conn.close()
+    select_query += (
+        f" ORDER BY datetimeofchat DESC LIMIT {limit} OFFSET {(page - 1) * limit}"
+    )
+    after = read_after(request)
+    pool = get_pool(read=True, after=after)
+    user = auth_result.get("sub")
+
+    async def fetch_page():
+        async with list_limiter.slot(), acquire(pool, settings.list_statement_timeout_ms) as conn:
+            total_count = await conn.fetchval(count_query)
+            records = await conn.fetch(select_query)
         return {"total_count": total_count, "records": records}
+
+    try:
+        async with list_limiter.share(user):
+            # Identical concurrent requests share one execution; the SQL is the normalized key
+            pending = fetch_page() if after is not None else session_list_flight.do(
+                (pool, count_query, select_query), fetch_page, retry_on=OverloadedException
+            )
+            return await cancel_on_disconnect(request, pending, "/session-data")
+    except HTTPException:
+        raise
+    except QueryCanceledError:
+        raise HTTPException(status_code=504, detail="Query took too long")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/session")
 async def get_session_by_id(
-        sid: UUID, flag: str, auth_result: str = Security(auth.verify)
+        request: Request, sid: UUID, flag: str, auth_result: str = Security(auth.verify)
 ):
-    if flag == "manual":
-        select_query = """
-           SELECT m.sessionid, m.severity, m.category, m.mark_as_complete, m.request_details, m.action_taken_notes, m.phonenumber,
-                  c.comment_id, c.comment, c.email,
-                  a.name AS assignee_name, a.email AS assignee_email, a.status AS assignee_status
-           FROM manualrecords m
-           LEFT JOIN comments c ON m.sessionid = c.sessionid_manual
-           LEFT JOIN assignee a ON m.sessionid = a.sessionid_manual
-           WHERE m.sessionid = $1
-           """
-    elif flag == "chat":
-        select_query = """
-           SELECT r.sessionid, r.severity, r.category, r.mark_as_complete, r.chatsummary, r.chattranscript, r.action_taken_notes, r.phonenumber,
-                  c.comment_id, c.comment, c.email,
-                  a.name AS assignee_name, a.email AS assignee_email, a.status AS assignee_status
-           FROM chatrecords r
-           LEFT JOIN comments c ON r.sessionid = c.sessionid_chat
-           LEFT JOIN assignee a ON r.sessionid = a.sessionid_chat
-           WHERE r.sessionid = $1
-           """
-    else:
+    select_query = SESSION_QUERIES.get(flag)
+    if select_query is None:
         raise HTTPException(status_code=400, detail="Invalid flag value")
 
+    after = read_after(request)
+    pool = get_pool(read=True, after=after)
+    user = auth_result.get("sub")
+
+    async def fetch_session():
+        async with detail_limiter.slot(), acquire(pool) as conn:
+            return await conn.fetch(select_query, sid)
+
     try:
-        conn = await get_connection()
-        records = await conn.fetch(select_query, sid)
-        await conn.close()
+        async with detail_limiter.share(user):
+            pending = fetch_session() if after is not None else session_detail_flight.do(
+                (pool, flag, sid), fetch_session, retry_on=OverloadedException
+            )
+            records = await cancel_on_disconnect(request, pending, "/session")
 
         if not records:
             raise HTTPException(status_code=404, detail="Session ID not found")
@@ -440,276 +558,341 @@ async def get_session_by_id(
                 "assignee_email": record["assignee_email"],
                 "assignee_status": record["assignee_status"],
             }
+    except HTTPException:
+        raise
+    except QueryCanceledError:
+        raise HTTPException(status_code=504, detail="Query took too long")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/session/{sid}/comments")
+@app.post("/session/{sid}/comments", dependencies=[write_admission])
 async def add_comment_to_session(
         sid: UUID,
         comment: Comment,
         email: str,
         flag: str,
+        response: Response,
         auth_result: str = Security(auth.verify),
 ):
+    # No foreign key can reference the partitioned records tables, so the
+    # inserts here and in assign check that the session exists themselves
     if flag == "manual":
         insert_query = """
         INSERT INTO comments (sessionid_manual, comment, email)
-        VALUES ((SELECT sessionid FROM manualrecords WHERE sessionid = $1), $2, $3)
+        SELECT $1::uuid, $2::text, $3::text
+        WHERE EXISTS (SELECT 1 FROM manualrecords WHERE sessionid = $1::uuid)
         RETURNING comment_id
         """
     elif flag == "chat":
         insert_query = """
         INSERT INTO comments (sessionid_chat, comment, email)
-        VALUES ((SELECT sessionid FROM chatrecords WHERE sessionid = $1), $2, $3)
+        SELECT $1::uuid, $2::text, $3::text
+        WHERE EXISTS (SELECT 1 FROM chatrecords WHERE sessionid = $1::uuid)
         RETURNING comment_id
         """
     else:
         raise HTTPException(status_code=400, detail="Invalid flag value")
 
     try:
-        conn = await get_connection()
-        record_id = await conn.fetchval(insert_query, sid, comment.comment, email)
-        await conn.close()
+        async with get_connection() as conn:
+            record_id = await conn.fetchval(insert_query, sid, comment.comment, email)
+            await remember_write(conn, response)
         if record_id:
             return {"comment_id": record_id, "comment": comment.comment}
         else:
             raise HTTPException(status_code=404, detail="Session ID not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/session/assign")
+@app.post("/session/assign", dependencies=[write_admission])
 async def assign(
         request_id: UUID,
         name: str,
         email: str,
         flag: str,
+        response: Response,
         auth_result: str = Security(auth.verify),
 ):
     if flag == "manual":
         update_query = """
-        UPDATE assignee
+        UPDATE assignee t
         SET name = $1, email = $2
-        WHERE sessionid_manual = $3
+        FROM (SELECT sessionid_manual, name, email FROM assignee WHERE sessionid_manual = $3 FOR UPDATE) old
+        WHERE t.sessionid_manual = old.sessionid_manual
+        RETURNING old.name AS old_name, t.name, old.email AS old_email, t.email
         """
         insert_query = """
         INSERT INTO assignee (sessionid_manual, name, email)
-        VALUES ($1, $2, $3)
+        SELECT $1::uuid, $2::text, $3::text
+        WHERE EXISTS (SELECT 1 FROM manualrecords WHERE sessionid = $1::uuid)
+        RETURNING name, email
         """
         # session_id_column = 'sessionid_manual'
     elif flag == "chat":
         update_query = """
-        UPDATE assignee
+        UPDATE assignee t
         SET name = $1, email = $2
-        WHERE sessionid_chat = $3
+        FROM (SELECT sessionid_chat, name, email FROM assignee WHERE sessionid_chat = $3 FOR UPDATE) old
+        WHERE t.sessionid_chat = old.sessionid_chat
+        RETURNING old.name AS old_name, t.name, old.email AS old_email, t.email
         """
         insert_query = """
         INSERT INTO assignee (sessionid_chat, name, email)
-        VALUES ($1, $2, $3)
+        SELECT $1::uuid, $2::text, $3::text
+        WHERE EXISTS (SELECT 1 FROM chatrecords WHERE sessionid = $1::uuid)
+        RETURNING name, email
         """
         # session_id_column = 'sessionid_chat'
     else:
         raise HTTPException(status_code=400, detail="Invalid flag value")
 
     try:
-        conn = await get_connection()
-        async with conn.transaction():
-            # First try to update if the record exists
-            result = await conn.execute(update_query, name, email, request_id)
-            # If the record does not exist, insert a new one
-            if result == "UPDATE 0":
-                await conn.execute(insert_query, request_id, name, email)
-        await conn.close()
+        async with get_connection() as conn:
+            async with conn.transaction():
+                # First try to update if the record exists
+                row = await conn.fetchrow(update_query, name, email, request_id)
+                # If the record does not exist, insert a new one
+                if row is None:
+                    inserted = await conn.fetchrow(insert_query, request_id, name, email)
+                    if inserted is None:
+                        raise HTTPException(status_code=404, detail="Session ID not found")
+            await remember_write(conn, response)
+        before, after = split_change(row) if row else (None, dict(inserted))
+        audit_trail.record(auth_result.get("sub"), "assign", request_id, flag, before, after)
         return {"message": "Request assigned successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.put("/session/status")
+@app.put("/session/status", dependencies=[write_admission])
 async def update_request_status(
-        request_id: UUID, status: str, flag: str, auth_result: str = Security(auth.verify)
+        request_id: UUID, status: str, flag: str, response: Response, auth_result: str = Security(auth.verify)
 ):
     if flag == "manual":
         update_query = """
-        UPDATE assignee
+        UPDATE assignee t
         SET status = $1
-        WHERE sessionid_manual = $2;
+        FROM (SELECT sessionid_manual, status FROM assignee WHERE sessionid_manual = $2 FOR UPDATE) old
+        WHERE t.sessionid_manual = old.sessionid_manual
+        RETURNING old.status AS old_status, t.status
         """
     elif flag == "chat":
         update_query = """
-        UPDATE assignee
+        UPDATE assignee t
         SET status = $1
-        WHERE sessionid_chat = $2;
+        FROM (SELECT sessionid_chat, status FROM assignee WHERE sessionid_chat = $2 FOR UPDATE) old
+        WHERE t.sessionid_chat = old.sessionid_chat
+        RETURNING old.status AS old_status, t.status
         """
     else:
         raise HTTPException(status_code=400, detail="Invalid flag value")
 
     try:
-        conn = await get_connection()
-        result = await conn.execute(update_query, status, request_id)
-        await conn.close()
-        if result == "UPDATE 1":
+        async with get_connection() as conn:
+            row = await conn.fetchrow(update_query, status, request_id)
+            await remember_write(conn, response)
+        if row is not None:
+            audit_trail.record(auth_result.get("sub"), "update_status", request_id, flag, *split_change(row))
             return {"message": "Request status updated successfully"}
         else:
             raise HTTPException(status_code=404, detail="Session ID not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.put("/update-chat-urgency")
+@app.put("/update-chat-urgency", dependencies=[write_admission])
 async def update_chat_urgency(
-        sid: UUID, urgency: str, flag: str, auth_result: str = Security(auth.verify)
+        sid: UUID, urgency: str, flag: str, response: Response, auth_result: str = Security(auth.verify)
 ):
     if flag == "manual":
         update_query = """
-        UPDATE manualrecords
+        UPDATE manualrecords t
         SET severity = $1
-        WHERE sessionid = $2
+        FROM (SELECT sessionid, severity FROM manualrecords WHERE sessionid = $2 FOR UPDATE) old
+        WHERE t.sessionid = old.sessionid
+        RETURNING old.severity AS old_severity, t.severity
         """
     elif flag == "chat":
         update_query = """
-        UPDATE chatrecords
+        UPDATE chatrecords t
         SET severity = $1
-        WHERE sessionid = $2
+        FROM (SELECT sessionid, severity FROM chatrecords WHERE sessionid = $2 FOR UPDATE) old
+        WHERE t.sessionid = old.sessionid
+        RETURNING old.severity AS old_severity, t.severity
         """
     else:
         raise HTTPException(status_code=400, detail="Invalid flag value")
 
     try:
-        conn = await get_connection()
-        result = await conn.execute(update_query, urgency, sid)
-        await conn.close()
-        if result == "UPDATE 1":
+        async with get_connection() as conn:
+            row = await conn.fetchrow(update_query, urgency, sid)
+            await remember_write(conn, response)
+        if row is not None:
+            audit_trail.record(auth_result.get("sub"), "update_urgency", sid, flag, *split_change(row))
             return {"message": "Chat urgency updated successfully"}
         else:
             raise HTTPException(status_code=404, detail="Session ID not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.put("/update-chat-team")
+@app.put("/update-chat-team", dependencies=[write_admission])
 async def update_chat_team(
-        sid: UUID, team: str, flag: str, auth_result: str = Security(auth.verify)
+        sid: UUID, team: str, flag: str, response: Response, auth_result: str = Security(auth.verify)
 ):
     if flag == "manual":
         update_query = """
-        UPDATE manualrecords
+        UPDATE manualrecords t
         SET category = $1, triaging_confirmed = True
-        WHERE sessionid = $2
+        FROM (SELECT sessionid, category, triaging_confirmed FROM manualrecords WHERE sessionid = $2 FOR UPDATE) old
+        WHERE t.sessionid = old.sessionid
+        RETURNING old.category AS old_category, t.category, old.triaging_confirmed AS old_triaging_confirmed, t.triaging_confirmed
         """
     elif flag == "chat":
         update_query = """
-        UPDATE chatrecords
+        UPDATE chatrecords t
         SET category = $1, triaging_confirmed = True
-        WHERE sessionid = $2
+        FROM (SELECT sessionid, category, triaging_confirmed FROM chatrecords WHERE sessionid = $2 FOR UPDATE) old
+        WHERE t.sessionid = old.sessionid
+        RETURNING old.category AS old_category, t.category, old.triaging_confirmed AS old_triaging_confirmed, t.triaging_confirmed
         """
     else:
         raise HTTPException(status_code=400, detail="Invalid flag value")
 
     try:
-        conn = await get_connection()
-        result = await conn.execute(update_query, team, sid)
-        await conn.close()
-        if result == "UPDATE 1":
+        async with get_connection() as conn:
+            row = await conn.fetchrow(update_query, team, sid)
+            await remember_write(conn, response)
+        if row is not None:
+            audit_trail.record(auth_result.get("sub"), "update_team", sid, flag, *split_change(row))
             return {"message": "Chat team updated successfully"}
         else:
             raise HTTPException(status_code=404, detail="Session ID not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/take-action")
+@app.post("/take-action", dependencies=[write_admission])
 async def take_action(
         sid: UUID,
         action_taken_notes: str,
         mark_as_complete: bool,
         flag: str,
+        response: Response,
         auth_result: str = Security(auth.verify),
 ):
     if flag == "manual":
         update_query = """
-        UPDATE manualrecords
+        UPDATE manualrecords t
         SET action_taken_notes = $1, mark_as_complete = $2
-        WHERE sessionid = $3
+        FROM (SELECT sessionid, action_taken_notes, mark_as_complete FROM manualrecords WHERE sessionid = $3 FOR UPDATE) old
+        WHERE t.sessionid = old.sessionid
+        RETURNING old.action_taken_notes AS old_action_taken_notes, t.action_taken_notes, old.mark_as_complete AS old_mark_as_complete, t.mark_as_complete
         """
     elif flag == "chat":
         update_query = """
-        UPDATE chatrecords
+        UPDATE chatrecords t
         SET action_taken_notes = $1, mark_as_complete = $2
-        WHERE sessionid = $3
+        FROM (SELECT sessionid, action_taken_notes, mark_as_complete FROM chatrecords WHERE sessionid = $3 FOR UPDATE) old
+        WHERE t.sessionid = old.sessionid
+        RETURNING old.action_taken_notes AS old_action_taken_notes, t.action_taken_notes, old.mark_as_complete AS old_mark_as_complete, t.mark_as_complete
         """
     else:
         raise HTTPException(status_code=400, detail="Invalid flag value")
 
     try:
-        conn = await get_connection()
-        result = await conn.execute(
-            update_query, action_taken_notes, mark_as_complete, sid
-        )
-        await conn.close()
-        if result == "UPDATE 1":
+        async with get_connection() as conn:
+            row = await conn.fetchrow(
+                update_query, action_taken_notes, mark_as_complete, sid
+            )
+            await remember_write(conn, response)
+        if row is not None:
+            action = "complete" if mark_as_complete else "take_action"
+            audit_trail.record(auth_result.get("sub"), action, sid, flag, *split_change(row))
             return {"message": "Action taken successfully"}
         else:
             raise HTTPException(status_code=404, detail="Session ID not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/add-manual-record")
+@app.post("/add-manual-record", dependencies=[write_admission])
 async def add_manual_record(
-        record: ManualRecordInput, auth_result: str = Security(auth.verify)
+        record: ManualRecordInput, response: Response, auth_result: str = Security(auth.verify)
 ):
     insert_query = """
     INSERT INTO manualrecords (name, emailorphonenumber, severity, category, request_details, datetime, phonenumber)
     VALUES ($1, $2, $3, $4, $5, $6, $7)
     """
     try:
-        conn = await get_connection()
-        await conn.execute(
-            insert_query,
-            record.name,
-            record.email,
-            record.severity,
-            record.team,
-            record.request_details,
-            record.datetime,
-            record.phonenumber
-        )
-        await conn.close()
+        async with get_connection() as conn:
+            await conn.execute(
+                insert_query,
+                record.name,
+                record.email,
+                record.severity,
+                record.team,
+                record.request_details,
+                record.datetime,
+                record.phonenumber
+            )
+            await remember_write(conn, response)
         return {"message": "Manual record added successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/reopen-request")
+@app.post("/reopen-request", dependencies=[write_admission])
 async def reopen_request(
-        sid: str, flag: str, auth_result: str = Security(auth.verify)
+        sid: str, flag: str, response: Response, auth_result: str = Security(auth.verify)
 ):
     if flag == "manual":
         update_query = """
-        UPDATE manualrecords
+        UPDATE manualrecords t
         SET mark_as_complete = false
-        WHERE sessionid = $1
+        FROM (SELECT sessionid, mark_as_complete FROM manualrecords WHERE sessionid = $1 FOR UPDATE) old
+        WHERE t.sessionid = old.sessionid
+        RETURNING old.mark_as_complete AS old_mark_as_complete, t.mark_as_complete
         """
     elif flag == "chat":
         update_query = """
-        UPDATE chatrecords
+        UPDATE chatrecords t
         SET mark_as_complete = false
-        WHERE sessionid = $1
+        FROM (SELECT sessionid, mark_as_complete FROM chatrecords WHERE sessionid = $1 FOR UPDATE) old
+        WHERE t.sessionid = old.sessionid
+        RETURNING old.mark_as_complete AS old_mark_as_complete, t.mark_as_complete
         """
     else:
         raise HTTPException(status_code=400, detail="Invalid flag value")
 
     try:
-        conn = await get_connection()
-        result = await conn.execute(
-            update_query, sid
-        )
-        await conn.close()
-        if result == "UPDATE 1":
+        async with get_connection() as conn:
+            row = await conn.fetchrow(
+                update_query, sid
+            )
+            await remember_write(conn, response)
+        if row is not None:
+            audit_trail.record(auth_result.get("sub"), "reopen", sid, flag, *split_change(row))
             return {"message": "Action taken successfully"}
         else:
             raise HTTPException(status_code=404, detail="Session ID not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
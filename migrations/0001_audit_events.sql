@@ -0,0 +1,13 @@
+-- Audit trail of triage mutations, written in batches by core.audit.
+CREATE TABLE IF NOT EXISTS audit_events (
+    id          bigserial PRIMARY KEY,
+    occurred_at timestamptz NOT NULL,
+    actor       text,
+    action      text NOT NULL,
+    sessionid   uuid NOT NULL,
+    flag        text NOT NULL,
+    before      jsonb,
+    after       jsonb
+);
+
+CREATE INDEX IF NOT EXISTS audit_events_sessionid_idx ON audit_events (sessionid, occurred_at);
@@ -0,0 +1,144 @@
+-- Converts chatrecords and manualrecords in place into partitioned tables:
+--
+--   chatrecords                  LIST (mark_as_complete)
+--     chatrecords_open           false / NULL: the hot working set
+--     chatrecords_done           true, RANGE (datetimeofchat) by month
+--       chatrecords_done_YYYY_MM
+--       chatrecords_done_default
+--
+-- manualrecords follows the same layout on "datetime". Completing or
+-- reopening a session moves its row between partitions, so list queries with
+-- history=false only touch the *_open partitions. tools.partitions creates
+-- future months and moves old months to a cold tablespace.
+--
+-- The primary key on sessionid cannot be kept (unique constraints on a
+-- partitioned table must include the partition keys). It is replaced by a
+-- unique index on (sessionid, mark_as_complete, <month column>), which
+-- rejects duplicates within a partition but not across partitions, and
+-- foreign keys referencing the two tables are dropped. Every other index,
+-- constraint and trigger, the grants and the owner are carried over, and
+-- sequences owned by the old table are handed to the new one. Other unique
+-- constraints must include the partition keys, and identity columns are not
+-- supported; the migration stops on either. Requires PostgreSQL 14+.
+--
+-- Both tables are copied with INSERT ... SELECT in the migration's single
+-- transaction, holding ACCESS EXCLUSIVE locks on them until it commits: the
+-- API cannot read or write either table for the whole run, so schedule it in
+-- a maintenance window sized to the tables.
+
+CREATE OR REPLACE FUNCTION ensure_monthly_partition(parent text, key text, month_start date) RETURNS text
+LANGUAGE plpgsql AS $$
+DECLARE
+    part_name text := parent || '_' || to_char(month_start, 'YYYY_MM');
+    lower_bound timestamptz := date_trunc('month', month_start::timestamp) AT TIME ZONE 'UTC';
+    upper_bound timestamptz := (date_trunc('month', month_start::timestamp) + interval '1 month') AT TIME ZONE 'UTC';
+BEGIN
+    IF to_regclass(part_name) IS NOT NULL THEN
+        RETURN part_name;
+    END IF;
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE '
+                   'INCLUDING COMPRESSION)', part_name, parent);
+    -- Rows for this month may already sit in the default partition
+    EXECUTE format('WITH moved AS (DELETE FROM %I WHERE %I >= %L AND %I < %L RETURNING *) '
+                   'INSERT INTO %I SELECT * FROM moved',
+                   parent || '_default', key, lower_bound, key, upper_bound, part_name);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   parent, part_name, lower_bound, upper_bound);
+    RETURN part_name;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION partition_records(tbl text, key text) RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+    legacy text := tbl || '_legacy';
+    owner_name name;
+    definitions text[];
+    definition text;
+    fk record;
+    seq record;
+    acl record;
+    part record;
+    first_month date;
+    month_start date;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = tbl::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+    IF EXISTS (SELECT 1 FROM pg_attribute WHERE attrelid = tbl::regclass AND attidentity <> '') THEN
+        RAISE EXCEPTION '% has identity columns, which partitioned tables do not support before PostgreSQL 17', tbl;
+    END IF;
+
+    FOR fk IN SELECT conrelid::regclass AS referencing, conname FROM pg_constraint
+              WHERE contype = 'f' AND confrelid = tbl::regclass LOOP
+        EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', fk.referencing, fk.conname);
+    END LOOP;
+
+    -- Constraints, indexes and triggers other than the primary key, captured
+    -- while their definitions still name tbl so they can be replayed on the new table
+    SELECT array_agg(def ORDER BY kind, name) INTO definitions FROM (
+        SELECT 1 AS kind, conname::text AS name,
+               format('ALTER TABLE %I ADD CONSTRAINT %I %s', tbl, conname, pg_get_constraintdef(oid)) AS def
+        FROM pg_constraint WHERE conrelid = tbl::regclass AND contype IN ('c', 'f', 'u', 'x')
+        UNION ALL
+        SELECT 2, indexrelid::regclass::text, pg_get_indexdef(indexrelid)
+        FROM pg_index i WHERE indrelid = tbl::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid AND c.conrelid = tbl::regclass)
+        UNION ALL
+        SELECT 3, tgname::text, pg_get_triggerdef(oid)
+        FROM pg_trigger WHERE tgrelid = tbl::regclass AND NOT tgisinternal
+    ) captured;
+    SELECT relowner::regrole::name INTO owner_name FROM pg_class WHERE oid = tbl::regclass;
+
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', tbl, legacy);
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING STORAGE INCLUDING COMPRESSION) '
+                   'PARTITION BY LIST (mark_as_complete)', tbl, legacy);
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES IN (false, NULL)', tbl || '_open', tbl);
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES IN (true) PARTITION BY RANGE (%I)',
+                   tbl || '_done', tbl, key);
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', tbl || '_done_default', tbl || '_done');
+
+    EXECUTE format('SELECT min(%I)::date FROM %I WHERE mark_as_complete', key, legacy) INTO first_month;
+    FOR month_start IN SELECT generate_series(date_trunc('month', COALESCE(first_month, current_date)),
+                                        current_date + interval '3 months', interval '1 month')::date LOOP
+        PERFORM ensure_monthly_partition(tbl || '_done', key, month_start);
+    END LOOP;
+
+    EXECUTE format('INSERT INTO %I SELECT * FROM %I', tbl, legacy);
+
+    FOR part IN SELECT relid FROM pg_partition_tree(tbl::regclass) LOOP
+        EXECUTE format('ALTER TABLE %s OWNER TO %I', part.relid, owner_name);
+    END LOOP;
+
+    -- Serial columns keep their sequence, which would otherwise be dropped with the legacy table
+    FOR seq IN SELECT attname, pg_get_serial_sequence(quote_ident(legacy), attname) AS sequence
+               FROM pg_attribute WHERE attrelid = legacy::regclass AND attnum > 0 AND NOT attisdropped LOOP
+        IF seq.sequence IS NOT NULL THEN
+            EXECUTE format('ALTER SEQUENCE %s OWNED BY %I.%I', seq.sequence, tbl, seq.attname);
+        END IF;
+    END LOOP;
+
+    -- Table and column privileges; PUBLIC is grantee 0
+    FOR acl IN SELECT x.privilege_type, NULL::name AS column_name, x.grantee, x.is_grantable
+               FROM pg_class c, aclexplode(c.relacl) x WHERE c.oid = legacy::regclass
+               UNION ALL
+               SELECT x.privilege_type, a.attname, x.grantee, x.is_grantable
+               FROM pg_attribute a, aclexplode(a.attacl) x WHERE a.attrelid = legacy::regclass LOOP
+        EXECUTE format('GRANT %s%s ON %I TO %s%s', acl.privilege_type,
+                       CASE WHEN acl.column_name IS NULL THEN '' ELSE format(' (%I)', acl.column_name) END, tbl,
+                       CASE WHEN acl.grantee = 0 THEN 'PUBLIC' ELSE quote_ident(pg_get_userbyid(acl.grantee)) END,
+                       CASE WHEN acl.is_grantable THEN ' WITH GRANT OPTION' ELSE '' END);
+    END LOOP;
+
+    EXECUTE format('DROP TABLE %I', legacy);
+    FOREACH definition IN ARRAY COALESCE(definitions, '{}') LOOP
+        EXECUTE definition;
+    END LOOP;
+    EXECUTE format('CREATE UNIQUE INDEX ON %I (sessionid, mark_as_complete, %I)', tbl, key);
+
+    EXECUTE format('ANALYZE %I', tbl);
+END;
+$$;
+
+SELECT partition_records('chatrecords', 'datetimeofchat');
+SELECT partition_records('manualrecords', 'datetime');
@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+
+from core.admission import AdmissionLimiter, OverloadedException
+
+
+def limiter(**overrides) -> AdmissionLimiter:
+    options = dict(max_concurrent=1, max_queue=1, queue_timeout=1.0, per_user=0, retry_after=3)
+    options.update(overrides)
+    return AdmissionLimiter("test", **options)
+
+
+async def hold(limiter: AdmissionLimiter, user: str, release: asyncio.Event):
+    async with limiter.admit(user):
+        await release.wait()
+
+
+async def settle():
+    """Lets started tasks run up to the point where they wait."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_requests_beyond_the_queue_are_shed():
+    async def scenario():
+        slots, release = limiter(), asyncio.Event()
+        running = asyncio.create_task(hold(slots, "a", release))
+        queued = asyncio.create_task(hold(slots, "b", release))
+        await settle()
+
+        with pytest.raises(OverloadedException) as shed:
+            async with slots.admit("c"):
+                pass
+        assert shed.value.status_code == 503
+        assert shed.value.headers == {"Retry-After": "3"}
+
+        release.set()
+        await asyncio.gather(running, queued)
+
+    asyncio.run(scenario())
+
+
+def test_burst_arriving_at_once_is_bounded():
+    async def scenario():
+        slots, release = limiter(max_concurrent=2, max_queue=2), asyncio.Event()
+        burst = [asyncio.create_task(hold(slots, str(i), release)) for i in range(10)]
+        await settle()
+        assert slots._in_flight == 2 and slots._queued == 2
+
+        release.set()
+        results = await asyncio.gather(*burst, return_exceptions=True)
+        assert sum(isinstance(result, OverloadedException) for result in results) == 6
+
+    asyncio.run(scenario())
+
+
+def test_queued_request_is_shed_after_the_timeout():
+    async def scenario():
+        slots, release = limiter(queue_timeout=0.01), asyncio.Event()
+        running = asyncio.create_task(hold(slots, "a", release))
+        await settle()
+
+        with pytest.raises(OverloadedException):
+            async with slots.admit("b"):
+                pass
+        assert slots._queued == 0
+
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+
+
+def test_queued_request_runs_once_a_slot_frees_up():
+    async def scenario():
+        slots, release = limiter(), asyncio.Event()
+        running = asyncio.create_task(hold(slots, "a", release))
+        await settle()
+        queued = asyncio.create_task(hold(slots, "b", asyncio.Event()))
+        await settle()
+        assert slots._queued == 1
+
+        release.set()
+        await running
+        await settle()
+        assert slots._queued == 0 and slots._in_flight == 1
+        queued.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_one_user_cannot_exceed_their_share():
+    async def scenario():
+        slots, release = limiter(max_concurrent=4, max_queue=4, per_user=2), asyncio.Event()
+        mine = [asyncio.create_task(hold(slots, "a", release)) for _ in range(2)]
+        await settle()
+
+        with pytest.raises(OverloadedException):
+            async with slots.admit("a"):
+                pass
+        async with slots.admit("b"):
+            pass
+
+        release.set()
+        await asyncio.gather(*mine)
+        assert not slots._by_user
+
+    asyncio.run(scenario())
+
+
+def test_slot_is_released_when_the_work_fails():
+    async def scenario():
+        slots = limiter(queue_timeout=0.01)
+        with pytest.raises(ValueError):
+            async with slots.admit("a"):
+                raise ValueError("query failed")
+
+        async with slots.admit("a"):
+            pass
+        assert slots._in_flight == 0 and slots._queued == 0 and not slots._by_user
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_wait_gives_up_its_queue_place():
+    async def scenario():
+        slots, release = limiter(), asyncio.Event()
+        running = asyncio.create_task(hold(slots, "a", release))
+        await settle()
+        queued = asyncio.create_task(hold(slots, "b", release))
+        await settle()
+
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        assert slots._queued == 0 and "b" not in slots._by_user
+
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+
+
+def test_share_is_counted_without_taking_a_slot():
+    async def scenario():
+        slots = limiter(per_user=1)
+        async with slots.share("a"):
+            assert slots._in_flight == 0
+            with pytest.raises(OverloadedException):
+                async with slots.share("a"):
+                    pass
+            async with slots.share("b"), slots.slot():
+                assert slots._in_flight == 1
+        assert not slots._by_user
+
+    asyncio.run(scenario())
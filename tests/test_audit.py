@@ -0,0 +1,100 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+
+from core import audit
+from core.audit import DROPPED, FAILED, AuditTrail, split_change
+
+
+class Pool:
+    """Collects the batches written with COPY; fails every write if told to."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batches = []
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    async def copy_records_to_table(self, table, records, columns):
+        if self.fail:
+            raise ConnectionError("connection lost")
+        assert table == "audit_events" and columns == audit.COLUMNS
+        self.batches.append(records)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = Pool()
+    monkeypatch.setattr(audit, "primary_pool", lambda: pool)
+    return pool
+
+
+def test_split_change_separates_old_values():
+    row = {"old_status": "open", "status": "closed", "sessionid": "s1"}
+    assert split_change(row) == ({"status": "open"}, {"status": "closed", "sessionid": "s1"})
+
+
+def test_events_beyond_the_queue_are_dropped(pool):
+    trail = AuditTrail(max_queue=2, batch_size=10)
+    dropped = DROPPED.get()
+    for _ in range(3):
+        trail.record("alice", "assign", "s1", "chat")
+    assert len(trail._queue) == 2
+    assert DROPPED.get() == dropped + 1
+
+
+def test_full_batch_wakes_the_writer(pool):
+    async def scenario():
+        trail = AuditTrail(batch_size=2, flush_interval=60)
+        writer = asyncio.create_task(trail.run())
+        trail.record("alice", "assign", "s1", "chat", before={"name": None}, after={"name": "bob"})
+        await asyncio.sleep(0)
+        assert pool.batches == []
+
+        trail.record("alice", "update_status", "s1", "chat")
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert [len(batch) for batch in pool.batches] == [2]
+        before, after = pool.batches[0][0][5:]
+        assert json.loads(before) == {"name": None} and json.loads(after) == {"name": "bob"}
+        assert pool.batches[0][1][5:] == (None, None)
+
+        await trail.close(writer)
+
+    asyncio.run(scenario())
+
+
+def test_close_drains_the_queue(pool):
+    async def scenario():
+        trail = AuditTrail(batch_size=2, flush_interval=60)
+        writer = asyncio.create_task(trail.run())
+        await asyncio.sleep(0)
+        for _ in range(5):
+            trail.record("alice", "take_action", "s1", "manual")
+
+        await trail.close(writer)
+        assert writer.done() and not trail._queue
+        assert sum(len(batch) for batch in pool.batches) == 5
+
+    asyncio.run(scenario())
+
+
+def test_failed_flush_is_counted_and_the_writer_keeps_going(pool):
+    async def scenario():
+        trail = AuditTrail(batch_size=2, flush_interval=60)
+        failed = FAILED.get()
+        pool.fail = True
+        trail.record("alice", "assign", "s1", "chat")
+        await trail.flush()
+        assert FAILED.get() == failed + 1 and not trail._queue
+
+        pool.fail = False
+        trail.record("alice", "assign", "s1", "chat")
+        await trail.flush()
+        assert len(pool.batches) == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,159 @@
+import asyncio
+
+import pytest
+
+from core.coalesce import SingleFlight
+
+
+class Work:
+    """Counts executions and blocks until released."""
+
+    def __init__(self, result="rows", unwind: float = 0.0):
+        self.result = result
+        self.unwind = unwind
+        self.calls = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            # Like asyncpg, which waits for the server to acknowledge the cancel
+            await asyncio.sleep(self.unwind)
+            raise
+        return self.result
+
+
+def test_followers_share_the_leaders_result():
+    async def scenario():
+        flight, work = SingleFlight("test"), Work()
+        callers = [asyncio.create_task(flight.do("key", work)) for _ in range(5)]
+        await asyncio.sleep(0)
+        work.release.set()
+        assert await asyncio.gather(*callers) == ["rows"] * 5
+        assert work.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_followers_share_the_leaders_exception():
+    async def scenario():
+        flight = SingleFlight("test")
+        started = asyncio.Event()
+
+        async def fail():
+            started.set()
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        callers = [asyncio.create_task(flight.do("key", fail)) for _ in range(3)]
+        await started.wait()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+
+    asyncio.run(scenario())
+
+
+def test_followers_retry_instead_of_sharing_a_retryable_exception():
+    class Shed(Exception):
+        pass
+
+    async def scenario():
+        flight, work = SingleFlight("test"), Work()
+        started = asyncio.Event()
+
+        async def shed():
+            started.set()
+            await asyncio.sleep(0)
+            raise Shed
+
+        leader = asyncio.create_task(flight.do("key", shed, retry_on=Shed))
+        await started.wait()
+        follower = asyncio.create_task(flight.do("key", work, retry_on=Shed))
+        await asyncio.sleep(0)
+        with pytest.raises(Shed):
+            await leader
+
+        await asyncio.sleep(0)
+        work.release.set()
+        assert await follower == "rows"
+        assert work.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        flight, work = SingleFlight("test"), Work()
+        callers = [asyncio.create_task(flight.do(key, work)) for key in ("a", "b")]
+        await asyncio.sleep(0)
+        work.release.set()
+        await asyncio.gather(*callers)
+        assert work.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_finished_flight_is_not_reused():
+    async def scenario():
+        flight, work = SingleFlight("test"), Work()
+        work.release.set()
+        await flight.do("key", work)
+        await flight.do("key", work)
+        assert work.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_one_waiter_keeps_the_work_running():
+    async def scenario():
+        flight, work = SingleFlight("test"), Work()
+        leader = asyncio.create_task(flight.do("key", work))
+        follower = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        work.release.set()
+        assert await follower == "rows"
+        assert work.cancelled == 0
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(scenario())
+
+
+def test_last_waiter_cancels_the_work():
+    async def scenario():
+        flight, work = SingleFlight("test"), Work()
+        callers = [asyncio.create_task(flight.do("key", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert work.cancelled == 1
+
+    asyncio.run(scenario())
+
+
+def test_caller_arriving_while_cancelled_work_unwinds_starts_afresh():
+    async def scenario():
+        flight, work = SingleFlight("test"), Work(unwind=0.05)
+        first = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert work.cancelled == 1
+
+        second = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        work.release.set()
+        assert await second == "rows"
+        assert work.calls == 2
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+"""Applies pending SQL migrations from migrations/ in order.
+
+Each file runs in its own transaction and is recorded in schema_migrations,
+so running this again only applies new files. Connection settings come from
+the PG* environment variables, as for the API.
+
+    python -m tools.migrate
+"""
+import asyncio
+import glob
+import os
+
+import asyncpg
+from dotenv import load_dotenv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS = os.path.join(ROOT, "migrations")
+
+
+async def migrate(conn: asyncpg.Connection) -> list:
+    await conn.execute("""
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version    text PRIMARY KEY,
+        applied_at timestamptz NOT NULL DEFAULT now()
+    )
+    """)
+    applied = {r["version"] for r in await conn.fetch("SELECT version FROM schema_migrations")}
+    done = []
+    for path in sorted(glob.glob(os.path.join(MIGRATIONS, "*.sql"))):
+        version = os.path.basename(path)
+        if version in applied:
+            continue
+        with open(path) as f:
+            sql = f.read()
+        async with conn.transaction():
+            await conn.execute(sql)
+            await conn.execute("INSERT INTO schema_migrations (version) VALUES ($1)", version)
+        done.append(version)
+    return done
+
+
+async def _main():
+    load_dotenv(dotenv_path=".venv/.env")
+    conn = await asyncpg.connect(server_settings={"timezone": "UTC"})
+    try:
+        for version in await migrate(conn):
+            print(f"applied {version}")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
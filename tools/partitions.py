@@ -0,0 +1,139 @@
+"""Maintenance and archival of the monthly partitions of completed records.
+
+    python -m tools.partitions maintain --months-ahead 3
+    python -m tools.partitions archive --older-than 6 --tablespace cold
+
+``maintain`` creates the next months' partitions and moves any rows that
+landed in a default partition into a partition of their own. ``archive``
+moves completed months older than the cutoff to a cold tablespace, which
+must already exist. Both are safe to run repeatedly, e.g. daily from cron.
+
+``archive`` copies each month under a SHARE lock: reads go on, but writes to
+sessions of that month wait, and may hit the API's statement_timeout, until
+the copy is done, so run it off-peak. The parent is locked exclusively only
+for the few catalog changes that swap the copy in, each attempt bounded by
+``--lock-timeout`` and retried.
+"""
+import argparse
+import asyncio
+from datetime import date
+
+import asyncpg
+from dotenv import load_dotenv
+
+# Parents of the monthly partitions, with their range column
+MONTHLY = [("chatrecords_done", "datetimeofchat"), ("manualrecords_done", "datetime")]
+
+
+def _add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+async def maintain(conn: asyncpg.Connection, months_ahead: int = 3) -> list:
+    today = date.today()
+    ensured = []
+    for parent, key in MONTHLY:
+        months = {_add_months(today, i) for i in range(months_ahead + 1)}
+        months |= {
+            r["month"] for r in await conn.fetch(
+                f"SELECT DISTINCT date_trunc('month', {key})::date AS month "
+                f"FROM {parent}_default WHERE {key} IS NOT NULL"
+            )
+        }
+        for month in sorted(months):
+            ensured.append(await conn.fetchval("SELECT ensure_monthly_partition($1, $2, $3)", parent, key, month))
+    return ensured
+
+
+async def _retry_on_lock(conn: asyncpg.Connection, statements: list, attempts: int, delay: float = 1.0):
+    """Runs ``statements`` in a savepoint, retrying the lot when lock_timeout expires."""
+    for attempt in range(attempts):
+        try:
+            async with conn.transaction():
+                for statement in statements:
+                    await conn.execute(statement)
+            return
+        except asyncpg.LockNotAvailableError:
+            if attempt + 1 == attempts:
+                raise
+            await asyncio.sleep(delay)
+
+
+async def _move_partition(conn: asyncpg.Connection, parent: str, name: str, bound: str, tablespace: str,
+                          lock_timeout_ms: int, attempts: int):
+    """Rebuilds partition ``name`` in ``tablespace`` and swaps the copy in.
+
+    ALTER TABLE ... SET TABLESPACE would hold an ACCESS EXCLUSIVE lock for the
+    whole rewrite, and /session filters on sessionid, which does not prune, so
+    every detail read would queue behind it.
+    """
+    cold = f"{name}_cold"
+    async with conn.transaction():
+        await conn.execute(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}")
+        await conn.execute(f'SET LOCAL default_tablespace = "{tablespace}"')
+        await _retry_on_lock(conn, [f'LOCK TABLE "{name}" IN SHARE MODE'], attempts)
+        await conn.execute(f'CREATE TABLE "{cold}" (LIKE "{name}" INCLUDING ALL)')
+        await conn.execute(f'INSERT INTO "{cold}" SELECT * FROM "{name}"')
+        # Lets ATTACH skip scanning the copy while the parent is locked
+        constraint = await conn.fetchval("SELECT pg_get_partition_constraintdef($1::regclass)", name)
+        await conn.execute(f'ALTER TABLE "{cold}" ADD CONSTRAINT "{cold}_bound" CHECK ({constraint})')
+        await _retry_on_lock(conn, [
+            f'ALTER TABLE "{parent}" DETACH PARTITION "{name}"',
+            f'ALTER TABLE "{parent}" ATTACH PARTITION "{cold}" {bound}',
+        ], attempts)
+        await conn.execute(f'ALTER TABLE "{cold}" DROP CONSTRAINT "{cold}_bound"')
+        await conn.execute(f'DROP TABLE "{name}"')
+        await conn.execute(f'ALTER TABLE "{cold}" RENAME TO "{name}"')
+
+
+async def archive(conn: asyncpg.Connection, older_than: int, tablespace: str, lock_timeout_ms: int = 500,
+                  attempts: int = 20) -> list:
+    cutoff = _add_months(date.today(), -older_than).strftime("%Y_%m")
+    moved = []
+    for parent, _ in MONTHLY:
+        partitions = await conn.fetch(
+            """
+            SELECT c.relname, COALESCE(t.spcname, '') AS tablespace, pg_get_expr(c.relpartbound, c.oid) AS bound
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            LEFT JOIN pg_tablespace t ON t.oid = c.reltablespace
+            WHERE i.inhparent = $1::regclass
+            """,
+            parent,
+        )
+        for partition in partitions:
+            month = partition["relname"][len(parent) + 1:]
+            if month == "default" or month >= cutoff or partition["tablespace"] == tablespace:
+                continue
+            await _move_partition(conn, parent, partition["relname"], partition["bound"], tablespace,
+                                  lock_timeout_ms, attempts)
+            moved.append(partition["relname"])
+    return moved
+
+
+async def _main(args):
+    load_dotenv(dotenv_path=".venv/.env")
+    conn = await asyncpg.connect(server_settings={"timezone": "UTC"})
+    try:
+        if args.command == "maintain":
+            result = await maintain(conn, args.months_ahead)
+        else:
+            result = await archive(conn, args.older_than, args.tablespace, args.lock_timeout)
+        for name in result:
+            print(name)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    maintain_parser = commands.add_parser("maintain", help="create upcoming partitions and split the defaults")
+    maintain_parser.add_argument("--months-ahead", type=int, default=3)
+    archive_parser = commands.add_parser("archive", help="move old completed months to a cold tablespace")
+    archive_parser.add_argument("--older-than", type=int, default=6, help="months")
+    archive_parser.add_argument("--tablespace", required=True)
+    archive_parser.add_argument("--lock-timeout", type=int, default=500,
+                                help="milliseconds to wait for each lock before retrying")
+    asyncio.run(_main(parser.parse_args()))